@@ -5,18 +5,28 @@ convert_assets_le.py - Convert Paper Mario N64 assets to Little Endian for PC
 Usage:
     ./configure us
     ninja
-    python3 convert_assets_le.py
+    python3 convert_assets_le.py [--jobs N] [--no-cache] [--pack] [--profile [JSON]]
 
 Outputs:
     assets_le/*.bin - Little-endian asset files (uncompressed)
     assets_le/vrom_table.h - C header mapping ROM addresses to files
+    assets_le/asset_pack.h - C header describing the assets.pak layout
+    assets_le/assets.pak - All of the above packed into one file (--pack)
 """
 
+import argparse
+import functools
+import hashlib
+import json
+import mmap
 import struct
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Dict, List, Tuple, Optional, Any, Sequence, Set, Union
 import sys
+import time
 
 try:
     import yaml
@@ -40,22 +50,43 @@ MAP_PATH = BUILD_DIR / "papermario.map"
 SPLAT_EXT_DIR = Path("tools/splat_ext")
 OUT_DIR = Path("assets_le")
 SPLIT_MAPFS = True
+JOBS = 1  # worker processes for MapFS and sprite conversion, set with --jobs
+CACHE_DIR = OUT_DIR / ".cache"
+USE_CACHE = True  # disabled with --no-cache
+WRITE_PACK = False  # also write assets_le/assets.pak, set with --pack
+PROFILE_PATH: Optional[Path] = None  # per-stage timing report, set with --profile
+
+# Any change to this script invalidates every cached conversion
+CONVERTER_VERSION = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+
+# YAML configs whose contents affect a segment's output
+SEGMENT_CONFIGS = {
+    'mapfs': SPLAT_EXT_DIR / "mapfs.yaml",
+    'icon': SPLAT_EXT_DIR / "icon.yaml",
+}
 
 # =============================================================================
 # Utility Functions
 # =============================================================================
 
-def read_u32_be(data: bytes, offset: int) -> int:
-    return struct.unpack(">I", data[offset:offset+4])[0]
+# Segments are memoryviews into the mmapped ROM; converters copy them into a
+# bytearray at most once and hand that buffer back without a final bytes() copy.
+Buffer = Union[bytes, bytearray, memoryview]
+
+def read_u32_be(data: Buffer, offset: int) -> int:
+    return struct.unpack_from(">I", data, offset)[0]
 
-def read_u16_be(data: bytes, offset: int) -> int:
-    return struct.unpack(">H", data[offset:offset+2])[0]
+def read_u16_be(data: Buffer, offset: int) -> int:
+    return struct.unpack_from(">H", data, offset)[0]
 
-def read_i32_be(data: bytes, offset: int) -> int:
-    return struct.unpack(">i", data[offset:offset+4])[0]
+def read_i32_be(data: Buffer, offset: int) -> int:
+    return struct.unpack_from(">i", data, offset)[0]
 
-def read_i16_be(data: bytes, offset: int) -> int:
-    return struct.unpack(">h", data[offset:offset+2])[0]
+def read_i16_be(data: Buffer, offset: int) -> int:
+    return struct.unpack_from(">h", data, offset)[0]
+
+def align(value: int, alignment: int) -> int:
+    return (value + alignment - 1) & ~(alignment - 1)
 
 def write_u32_le(data: bytearray, offset: int, value: int):
     struct.pack_into("<I", data, offset, value)
@@ -72,15 +103,56 @@ def swap32(data: bytearray, offset: int):
         data[offset], data[offset+1], data[offset+2], data[offset+3] = \
             data[offset+3], data[offset+2], data[offset+1], data[offset]
 
+# Bulk swaps work on whole slices at once via extended slice assignment,
+# clamped to the buffer the same way the single-element swaps are.
+
+def _clamp_count(data: bytearray, start: int, count: int, width: int) -> int:
+    if start < 0 or count <= 0:
+        return 0
+    return min(count, (len(data) - start) // width)
+
 def swap16_range(data: bytearray, start: int, count: int):
-    for i in range(count):
-        swap16(data, start + i * 2)
+    count = _clamp_count(data, start, count, 2)
+    if count <= 0:
+        return
+    end = start + count * 2
+    data[start:end:2], data[start+1:end:2] = data[start+1:end:2], data[start:end:2]
 
 def swap32_range(data: bytearray, start: int, count: int):
-    for i in range(count):
-        swap32(data, start + i * 4)
+    count = _clamp_count(data, start, count, 4)
+    if count <= 0:
+        return
+    end = start + count * 4
+    b0 = data[start:end:4]
+    b1 = data[start+1:end:4]
+    data[start:end:4] = data[start+3:end:4]
+    data[start+1:end:4] = data[start+2:end:4]
+    data[start+2:end:4] = b1
+    data[start+3:end:4] = b0
+
+def swap_strided(data: bytearray, start: int, count: int, stride: int, width: int):
+    """Swap one `width`-byte word at the same position in `count` records spaced `stride` bytes apart"""
+    if start < 0 or count <= 0:
+        return
+    count = min(count, (len(data) - start - width) // stride + 1)
+    if count <= 0:
+        return
+    end = start + (count - 1) * stride + 1
+    lanes = [data[start+i:end+i:stride] for i in range(width)]
+    for i in range(width):
+        data[start+i:end+i:stride] = lanes[width - 1 - i]
 
-def read_offset_list_be(data: bytes, offset: int) -> List[int]:
+def count_u32_until(data: Buffer, offset: int, pred) -> int:
+    """Number of u32s from offset up to and including the first one matching pred"""
+    count = 0
+    while offset + 4 <= len(data):
+        count += 1
+        if pred(read_u32_be(data, offset)):
+            break
+        offset += 4
+    return count
+
+def read_offset_list_be(data: Buffer, offset: int) -> List[int]:
     result = []
     while offset + 4 <= len(data):
         val = read_i32_be(data, offset)
@@ -91,24 +163,20 @@ def read_offset_list_be(data: bytes, offset: int) -> List[int]:
     return result
 
 def swap_offset_list(data: bytearray, offset: int) -> int:
-    count = 0
-    while offset + 4 <= len(data):
-        val = read_i32_be(data, offset)
-        swap32(data, offset)
-        offset += 4
-        if val == -1:
-            break
-        count += 1
+    count = len(read_offset_list_be(data, offset))
+    terminated = offset + count * 4 + 4 <= len(data)
+    swap32_range(data, offset, count + (1 if terminated else 0))
     return count
 
-def decompress_yay0(data: bytes) -> bytes:
+def decompress_yay0(data: Buffer) -> bytes:
     if not HAS_CRUNCH64:
         raise RuntimeError("crunch64 required for YAY0 decompression")
     if len(data) < 4 or data[0:4] != b'Yay0':
         raise ValueError("Not YAY0 data")
-    return crunch64.yay0.decompress(data)
+    # crunch64 only accepts bytes objects
+    return crunch64.yay0.decompress(bytes(data))
 
-def is_yay0(data: bytes) -> bool:
+def is_yay0(data: Buffer) -> bool:
     return len(data) >= 4 and data[0:4] == b'Yay0'
 
 def load_yaml(path: Path) -> Any:
@@ -117,12 +185,161 @@ def load_yaml(path: Path) -> Any:
     with open(path, 'r') as f:
         return yaml.safe_load(f)
 
-def decode_null_terminated_ascii(data: bytes) -> str:
+def decode_null_terminated_ascii(data: Buffer) -> str:
+    data = bytes(data)
     end = data.find(0)
     if end == -1:
         end = len(data)
     return data[:end].decode('ascii', errors='ignore')
 
+# =============================================================================
+# Struct Layouts
+# =============================================================================
+
+# A swap plan is a list of (offset, width, count) runs of big-endian words
+SwapRun = Tuple[int, int, int]
+
+def apply_swap_plan(data: bytearray, offset: int, plan: Sequence[SwapRun]):
+    for run_off, width, count in plan:
+        if width == 2:
+            swap16_range(data, offset + run_off, count)
+        elif width == 4:
+            swap32_range(data, offset + run_off, count)
+
+class StructLayout:
+    """Declarative description of a big-endian struct.
+
+    Fields are (name, width, count) in declaration order; width 1 fields are bytes
+    and need no swapping. The layout compiles once into a swap plan of merged runs,
+    which is applied to single structs, arrays of structs (strided, in bulk) or
+    trees of structs linked through pointer fields named in `pointers`.
+    """
+
+    def __init__(self, name: str, fields: List[Tuple[str, int, int]], size: Optional[int] = None):
+        self.name = name
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        self.plan: List[SwapRun] = []
+        self.pointers: Dict[str, "StructLayout"] = {}
+
+        pos = 0
+        fmt = ">"
+        codes = {1: "B", 2: "H", 4: "I"}
+        for field_name, width, count in fields:
+            self.offsets[field_name] = (pos, width)
+            fmt += f"{count}{codes[width]}" if count > 1 else codes[width]
+            if width > 1:
+                last = self.plan[-1] if self.plan else None
+                if last and last[1] == width and last[0] + last[1] * last[2] == pos:
+                    self.plan[-1] = (last[0], width, last[2] + count)
+                else:
+                    self.plan.append((pos, width, count))
+            pos += width * count
+
+        self.size = size if size is not None else pos
+        self._struct = struct.Struct(fmt)
+        self._names = [(field_name, count) for field_name, _, count in fields]
+
+    def fits(self, data: Buffer, offset: int) -> bool:
+        return 0 <= offset and offset + self.size <= len(data)
+
+    def unpack(self, data: Buffer, offset: int) -> Dict[str, Any]:
+        """Read all fields as big-endian; array fields become tuples"""
+        values = self._struct.unpack_from(data, offset)
+        result = {}
+        pos = 0
+        for field_name, count in self._names:
+            result[field_name] = values[pos] if count == 1 else values[pos:pos+count]
+            pos += count
+        return result
+
+    def read(self, data: Buffer, offset: int, field_name: str) -> int:
+        field_off, width = self.offsets[field_name]
+        return int.from_bytes(data[offset + field_off:offset + field_off + width], "big")
+
+    def swap(self, data: bytearray, offset: int):
+        apply_swap_plan(data, offset, self.plan)
+
+    def swap_array(self, data: bytearray, offset: int, count: int):
+        """Swap `count` consecutive structs, one strided pass per word of the struct"""
+        for run_off, width, run_count in self.plan:
+            for i in range(run_count):
+                swap_strided(data, offset + run_off + i * width, count, self.size, width)
+
+    def swap_tree(self, data: bytearray, offset: int, visited: Optional[set] = None):
+        """Swap this struct and every struct reachable through its pointer fields, once each"""
+        if visited is None:
+            visited = set()
+        stack = [(self, offset)]
+        while stack:
+            layout, offset = stack.pop()
+            if offset in visited or not layout.fits(data, offset):
+                continue
+            visited.add(offset)
+            targets = [(target, layout.read(data, offset, field_name))
+                       for field_name, target in layout.pointers.items()]
+            layout.swap(data, offset)
+            stack.extend((target, ptr) for target, ptr in reversed(targets) if 0 < ptr < len(data))
+
+SPRITE_HEADER = StructLayout("SpriteHeader", [
+    ("rasters", 4, 1),
+    ("palettes", 4, 1),
+    ("max_components", 4, 1),
+    ("color_variations", 4, 1),
+])
+
+SPRITE_COMPONENT = StructLayout("SpriteComponent", [
+    ("cmd_list", 4, 1),
+    ("cmd_size", 2, 1),
+    ("pos", 2, 3),
+])
+
+SHAPE_HEADER = StructLayout("ShapeHeader", [
+    ("display_list", 4, 1),
+    ("group_list", 4, 1),
+    ("property_list", 4, 1),
+    ("vertex_list", 4, 1),
+    ("unk_10", 4, 1),
+])
+
+MODEL_GROUP = StructLayout("ModelGroup", [
+    ("type", 4, 1),
+    ("child", 4, 1),
+    ("sibling", 4, 1),
+    ("unk_0C", 4, 1),
+    ("unk_10", 4, 1),
+])
+MODEL_GROUP.pointers = {"child": MODEL_GROUP, "sibling": MODEL_GROUP}
+
+VTX = StructLayout("Vtx", [
+    ("ob", 2, 3),
+    ("flag", 2, 1),
+    ("tc", 2, 2),
+    ("cn", 1, 4),
+])
+
+TEX_HEADER = StructLayout("TextureHeader", [
+    ("name", 1, 32),
+    ("aux_width", 2, 1),
+    ("main_width", 2, 1),
+    ("aux_height", 2, 1),
+    ("main_height", 2, 1),
+    ("is_variant", 1, 1),
+    ("extra_tiles", 1, 1),
+    ("color_combine", 1, 1),
+    ("fmts", 1, 1),
+    ("depths", 1, 1),
+    ("hwrap", 1, 1),
+    ("vwrap", 1, 1),
+    ("filter", 1, 1),
+])
+
+BG_HEADER = StructLayout("BackgroundHeader", [
+    ("raster", 4, 1),
+    ("palette", 4, 1),
+    ("start", 4, 1),
+    ("size", 2, 2),
+])
+
 # =============================================================================
 # Map File Parser
 # =============================================================================
@@ -235,6 +452,172 @@ def get_icon_config() -> IconConfig:
         _icon_config = IconConfig()
     return _icon_config
 
+# =============================================================================
+# Conversion Cache
+# =============================================================================
+
+class ConversionCache:
+    """Content-addressed record of what produced the files in OUT_DIR.
+
+    Entries are keyed by (kind, name) and store the digest of the inputs that
+    produced them, so unchanged segments and MapFS entries are skipped. Converted
+    blobs that are not written to OUT_DIR on their own (e.g. sprites) are kept
+    under CACHE_DIR/objects by digest. Segment records list the objects their
+    conversion used, and objects no record lists are deleted on save.
+    """
+
+    def __init__(self, cache_dir: Path, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.index_path = cache_dir / "index.json"
+        self.enabled = enabled
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.used_objects: Set[str] = set()
+        self.dirty = False
+        if enabled:
+            self._load()
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            index = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            print(f"    Warning: {self.index_path} is unreadable, ignoring cache")
+            return
+        if index.get("version") == CONVERTER_VERSION:
+            self.entries = index.get("entries", {})
+
+    @staticmethod
+    def digest(*parts: Any) -> str:
+        h = hashlib.blake2b(digest_size=20)
+        h.update(CONVERTER_VERSION.encode())
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode()
+            elif not isinstance(part, (bytes, bytearray, memoryview)):
+                part = json.dumps(part, sort_keys=True).encode()
+            h.update(len(part).to_bytes(8, "little"))
+            h.update(part)
+        return h.hexdigest()
+
+    def lookup(self, kind: str, name: str, digest: str, outputs: List[Path]) -> Optional[Dict[str, Any]]:
+        """Return the stored record if it matches digest and all outputs still exist"""
+        if not self.enabled:
+            return None
+        record = self.entries.get(f"{kind}:{name}")
+        if record is None or record.get("digest") != digest:
+            return None
+        if not all(path.exists() for path in outputs):
+            return None
+        return record
+
+    def store(self, kind: str, name: str, digest: str, **meta: Any):
+        if not self.enabled:
+            return
+        self.entries[f"{kind}:{name}"] = {"digest": digest, **meta}
+        self.dirty = True
+
+    def _object_path(self, digest: str) -> Path:
+        return self.cache_dir / "objects" / digest[:2] / f"{digest}.bin"
+
+    def load_object(self, digest: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        path = self._object_path(digest)
+        if not path.exists():
+            return None
+        self.used_objects.add(digest)
+        return path.read_bytes()
+
+    def save_object(self, digest: str, data: bytes):
+        if not self.enabled:
+            return
+        path = self._object_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        self.used_objects.add(digest)
+
+    def take_used_objects(self) -> List[str]:
+        """Digests of the objects loaded or saved since the last call"""
+        used = sorted(self.used_objects)
+        self.used_objects.clear()
+        return used
+
+    def prune_objects(self):
+        """Delete objects that no entry references"""
+        referenced = {digest for record in self.entries.values() for digest in record.get("objects", ())}
+        referenced.update(self.used_objects)
+        for path in (self.cache_dir / "objects").glob("*/*.bin"):
+            if path.stem not in referenced:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def save(self):
+        if not self.enabled or not self.dirty:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"version": CONVERTER_VERSION, "entries": self.entries}))
+        tmp_path.replace(self.index_path)
+        self.dirty = False
+        self.prune_objects()
+
+_conversion_cache: Optional[ConversionCache] = None
+
+def get_conversion_cache() -> ConversionCache:
+    global _conversion_cache
+    if _conversion_cache is None:
+        _conversion_cache = ConversionCache(CACHE_DIR, USE_CACHE)
+    return _conversion_cache
+
+def read_segment_config(seg_name: str) -> bytes:
+    config_path = SEGMENT_CONFIGS.get(seg_name)
+    if config_path is None or not config_path.exists():
+        return b''
+    return config_path.read_bytes()
+
+# =============================================================================
+# Profiler
+# =============================================================================
+
+class Profiler:
+    """Accumulates wall time and bytes in/out per stage, reported as JSON with --profile"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    def record(self, group: str, name: str, seconds: float, bytes_in: int, bytes_out: int):
+        stats = self.stages.setdefault(group, {}).setdefault(name, {
+            "count": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0,
+        })
+        stats["count"] += 1
+        stats["seconds"] += seconds
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+
+    def report(self) -> Dict[str, Any]:
+        report = {}
+        for group, stages in self.stages.items():
+            report[group] = {}
+            for name, stats in stages.items():
+                seconds = stats["seconds"]
+                report[group][name] = {
+                    **stats,
+                    "seconds": round(seconds, 6),
+                    "mb_per_s": round(stats["bytes_in"] / seconds / 1e6, 3) if seconds > 0 else None,
+                }
+        return report
+
+    def write(self, out_path: Path):
+        out_path.write_text(json.dumps(self.report(), indent=2, sort_keys=True) + "\n")
+
+_profiler = Profiler()
+
+def get_profiler() -> Profiler:
+    return _profiler
+
 # =============================================================================
 # Sprite Converter - Decompresses YAY0 and converts to LE
 # =============================================================================
@@ -243,14 +626,11 @@ def convert_animation_component(data: bytearray, comp_offset: int):
     if comp_offset + 12 > len(data):
         return
 
-    cmd_offset = read_u32_be(data, comp_offset)
-    cmd_size = read_u16_be(data, comp_offset + 4)
+    comp = SPRITE_COMPONENT.unpack(data, comp_offset)
+    cmd_offset = comp["cmd_list"]
+    cmd_size = comp["cmd_size"]
 
-    swap32(data, comp_offset)
-    swap16(data, comp_offset + 4)
-    swap16(data, comp_offset + 6)
-    swap16(data, comp_offset + 8)
-    swap16(data, comp_offset + 10)
+    SPRITE_COMPONENT.swap(data, comp_offset)
 
     if cmd_offset + cmd_size <= len(data):
         swap16_range(data, cmd_offset, cmd_size // 2)
@@ -259,14 +639,15 @@ def convert_npc_sprite(data: bytearray):
     if len(data) < 16:
         return
 
-    img_list_off = read_u32_be(data, 0x00)
-    pal_list_off = read_u32_be(data, 0x04)
+    header = SPRITE_HEADER.unpack(data, 0)
+    img_list_off = header["rasters"]
+    pal_list_off = header["palettes"]
 
     img_offsets = read_offset_list_be(data, img_list_off)
     pal_offsets = read_offset_list_be(data, pal_list_off)
     anim_offsets = read_offset_list_be(data, 0x10)
 
-    swap32_range(data, 0x00, 4)
+    SPRITE_HEADER.swap(data, 0)
 
     swap_offset_list(data, img_list_off)
     swap_offset_list(data, pal_list_off)
@@ -290,14 +671,15 @@ def convert_player_sprite(data: bytearray):
     if len(data) < 16:
         return
 
-    raster_list_off = read_u32_be(data, 0x00)
-    pal_list_off = read_u32_be(data, 0x04)
+    header = SPRITE_HEADER.unpack(data, 0)
+    raster_list_off = header["rasters"]
+    pal_list_off = header["palettes"]
 
     raster_offsets = read_offset_list_be(data, raster_list_off)
     pal_offsets = read_offset_list_be(data, pal_list_off)
     anim_offsets = read_offset_list_be(data, 0x10)
 
-    swap32_range(data, 0x00, 4)
+    SPRITE_HEADER.swap(data, 0)
 
     swap_offset_list(data, raster_list_off)
     swap_offset_list(data, pal_list_off)
@@ -317,7 +699,87 @@ def convert_player_sprite(data: bytearray):
         for comp_off in comp_offsets:
             convert_animation_component(data, comp_off)
 
-def convert_sprites_segment(data: bytes) -> bytes:
+def decompress_sprite(yay0_data: Buffer, converter, label: str) -> Buffer:
+    """Decompress and convert one sprite. Runs in a worker process when JOBS > 1."""
+    try:
+        decompressed = bytearray(decompress_yay0(yay0_data))
+        converter(decompressed)
+    except Exception as e:
+        print(f"      Warning: {label}: {e}")
+        return b''
+    return decompressed
+
+def load_sprites(tasks: List[Tuple[Buffer, Any, str]]) -> List[Buffer]:
+    """Decompress and convert (yay0_data, converter, label) tasks, in order.
+
+    Results for identical input are reused from the conversion cache; the rest are
+    spread over a process pool when JOBS > 1.
+    """
+    cache = get_conversion_cache()
+    results: List[Buffer] = [b''] * len(tasks)
+    pending = []
+
+    for i, (yay0_data, converter, label) in enumerate(tasks):
+        if not is_yay0(yay0_data):
+            continue
+        digest = cache.digest("sprite", converter.__name__, yay0_data)
+        cached = cache.load_object(digest)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append((i, digest))
+
+    if pending and JOBS > 1:
+        print(f"    Converting {len(pending)} sprites with {JOBS} jobs")
+        # memoryviews into the ROM mapping can't be pickled
+        args = [(bytes(tasks[i][0]), tasks[i][1], tasks[i][2]) for i, _ in pending]
+        with ProcessPoolExecutor(max_workers=JOBS) as pool:
+            converted = list(pool.map(decompress_sprite, *zip(*args), chunksize=4))
+    else:
+        converted = [decompress_sprite(*tasks[i]) for i, _ in pending]
+
+    for (i, digest), result in zip(pending, converted):
+        results[i] = result
+        if len(result) > 0:
+            cache.save_object(digest, result)
+
+    return results
+
+def sprite_data_ranges(base: int, offsets: List[int], end: int) -> List[Optional[Tuple[int, int]]]:
+    """(start, end) of each sprite's compressed data, or None for empty slots.
+
+    Each sprite runs up to the next non-empty one, the last up to end.
+    """
+    ranges: List[Optional[Tuple[int, int]]] = [None] * len(offsets)
+    next_start = end
+    for i in reversed(range(len(offsets))):
+        if offsets[i] != 0:
+            ranges[i] = (base + offsets[i], next_start)
+            next_start = base + offsets[i]
+    return ranges
+
+def layout_sprite_data(table_pos: int, table_size: int, sprites: List[Buffer]) -> Tuple[List[int], int]:
+    """Place each sprite after its offset table, 4-byte aligned.
+
+    Returns the table offsets (relative to table_pos, 0 for empty sprites) and the end position.
+    """
+    offsets = []
+    pos = table_pos + table_size
+    for sprite_data in sprites:
+        if len(sprite_data) > 0:
+            offsets.append(pos - table_pos)
+            pos = align(pos + len(sprite_data), 4)
+        else:
+            offsets.append(0)
+    return offsets, pos
+
+def write_sprite_data(out: bytearray, table_pos: int, offsets: List[int], sprites: List[Buffer]):
+    for i, (offset, sprite_data) in enumerate(zip(offsets, sprites)):
+        write_u32_le(out, table_pos + i * 4, offset)
+        if offset:
+            out[table_pos + offset:table_pos + offset + len(sprite_data)] = sprite_data
+
+def convert_sprites_segment(data: Buffer) -> Buffer:
     """Convert sprite segment - decompress all YAY0 sprites and convert to LE"""
 
     if len(data) < 0x20:
@@ -341,15 +803,8 @@ def convert_sprites_segment(data: bytes) -> bytes:
 
         swap32_range(player_raster_data, 0, 3)
 
-        pos = idx_ranges_off
-        while pos + 4 <= raster_info_off:
-            swap32(player_raster_data, pos)
-            pos += 4
-
-        pos = raster_info_off
-        while pos + 4 <= ci4_data_off:
-            swap32(player_raster_data, pos)
-            pos += 4
+        swap32_range(player_raster_data, idx_ranges_off, (raster_info_off - idx_ranges_off) // 4)
+        swap32_range(player_raster_data, raster_info_off, (ci4_data_off - raster_info_off) // 4)
 
     # Read player YAY0 offset table (14 player sprites)
     player_yay0_offsets = []
@@ -369,131 +824,42 @@ def convert_sprites_segment(data: bytes) -> bytes:
 
     print(f"    Found {len(player_yay0_offsets)} player sprites, {len(npc_yay0_offsets)} NPC sprites")
 
-    # Decompress and convert player sprites
-    player_sprites = []
-    for i, off in enumerate(player_yay0_offsets):
-        if off == 0:
-            player_sprites.append(b'')
-            continue
-
-        # Find end of this sprite's compressed data
-        next_off = None
-        for j in range(i + 1, len(player_yay0_offsets)):
-            if player_yay0_offsets[j] != 0:
-                next_off = player_yay0_off + player_yay0_offsets[j]
-                break
-        if next_off is None:
-            next_off = npc_yay0_off
-
-        yay0_start = player_yay0_off + off
-        yay0_data = data[yay0_start:next_off]
-
-        if is_yay0(yay0_data):
-            try:
-                decompressed = bytearray(decompress_yay0(yay0_data))
-                convert_player_sprite(decompressed)
-                player_sprites.append(bytes(decompressed))
-            except Exception as e:
-                print(f"      Warning: Player sprite {i}: {e}")
-                player_sprites.append(b'')
-        else:
-            player_sprites.append(b'')
-
-    # Decompress and convert NPC sprites
-    npc_sprites = []
-    for i, off in enumerate(npc_yay0_offsets):
-        if off == 0:
-            npc_sprites.append(b'')
-            continue
-
-        # Find end of this sprite's compressed data
-        next_off = None
-        for j in range(i + 1, len(npc_yay0_offsets)):
-            if npc_yay0_offsets[j] != 0:
-                next_off = npc_yay0_off + npc_yay0_offsets[j]
-                break
-        if next_off is None:
-            next_off = sprite_end_off
-
-        yay0_start = npc_yay0_off + off
-        yay0_data = data[yay0_start:next_off]
-
-        if is_yay0(yay0_data):
-            try:
-                decompressed = bytearray(decompress_yay0(yay0_data))
-                convert_npc_sprite(decompressed)
-                npc_sprites.append(bytes(decompressed))
-            except Exception as e:
-                print(f"      Warning: NPC sprite {i}: {e}")
-                npc_sprites.append(b'')
-        else:
-            npc_sprites.append(b'')
-
-    # Build output file
-    out = bytearray()
-
-    # Reserve space for header (0x20 bytes)
-    out.extend(b'\x00' * 0x20)
-
-    # Write player raster table
-    new_player_raster_off = len(out) - 0x10
-    out.extend(player_raster_data)
-
-    # Align to 4 bytes
-    while len(out) % 4 != 0:
-        out.append(0)
-
-    # Write player sprite offset table
-    new_player_yay0_off = len(out) - 0x10
-    player_sprite_table_pos = len(out)
-    out.extend(b'\x00' * (14 * 4))
-
-    # Write player sprite data and update offsets
-    # Offsets are relative to the table position
-    for i, sprite_data in enumerate(player_sprites):
-        if len(sprite_data) > 0:
-            offset = len(out) - player_sprite_table_pos
-            write_u32_le(out, player_sprite_table_pos + i * 4, offset)
-            out.extend(sprite_data)
-            while len(out) % 4 != 0:
-                out.append(0)
-        else:
-            write_u32_le(out, player_sprite_table_pos + i * 4, 0)
-
-    # Align to 16 bytes before NPC section
-    while len(out) % 16 != 0:
-        out.append(0)
-
-    # Write NPC sprite offset table
-    new_npc_yay0_off = len(out) - 0x10
-    npc_sprite_table_pos = len(out)
-    out.extend(b'\x00' * ((len(npc_yay0_offsets) + 1) * 4))
-
-    # Write NPC sprite data and update offsets
-    # Offsets are relative to the table position
-    for i, sprite_data in enumerate(npc_sprites):
-        if len(sprite_data) > 0:
-            offset = len(out) - npc_sprite_table_pos
-            write_u32_le(out, npc_sprite_table_pos + i * 4, offset)
-            out.extend(sprite_data)
-            while len(out) % 4 != 0:
-                out.append(0)
-        else:
-            write_u32_le(out, npc_sprite_table_pos + i * 4, 0)
-
-    # Write sentinel for NPC table
-    write_u32_le(out, npc_sprite_table_pos + len(npc_yay0_offsets) * 4, 0)
-
-    # Update header with new offsets
-    new_end_off = len(out) - 0x10
-    write_u32_le(out, 0x10, new_player_raster_off)
-    write_u32_le(out, 0x14, new_player_yay0_off)
-    write_u32_le(out, 0x18, new_npc_yay0_off)
-    write_u32_le(out, 0x1C, new_end_off)
+    # Decompress and convert player and NPC sprites together, then split the results
+    tasks = []
+    for i, rng in enumerate(sprite_data_ranges(player_yay0_off, player_yay0_offsets, npc_yay0_off)):
+        yay0_data = data[rng[0]:rng[1]] if rng else b''
+        tasks.append((yay0_data, convert_player_sprite, f"Player sprite {i}"))
+    for i, rng in enumerate(sprite_data_ranges(npc_yay0_off, npc_yay0_offsets, sprite_end_off)):
+        yay0_data = data[rng[0]:rng[1]] if rng else b''
+        tasks.append((yay0_data, convert_npc_sprite, f"NPC sprite {i}"))
+
+    sprites = load_sprites(tasks)
+    player_sprites = sprites[:len(player_yay0_offsets)]
+    npc_sprites = sprites[len(player_yay0_offsets):]
+
+    # Lay out the output up front so it can be written into one preallocated buffer
+    player_raster_pos = 0x20
+    player_sprite_table_pos = align(player_raster_pos + len(player_raster_data), 4)
+    player_offsets, pos = layout_sprite_data(player_sprite_table_pos, 14 * 4, player_sprites)
+
+    # NPC section is 16-byte aligned, and its table has a zero sentinel
+    npc_sprite_table_pos = align(pos, 16)
+    npc_offsets, end_pos = layout_sprite_data(npc_sprite_table_pos, (len(npc_yay0_offsets) + 1) * 4, npc_sprites)
+
+    out = bytearray(end_pos)
+    out[player_raster_pos:player_raster_pos + len(player_raster_data)] = player_raster_data
+    write_sprite_data(out, player_sprite_table_pos, player_offsets, player_sprites)
+    write_sprite_data(out, npc_sprite_table_pos, npc_offsets, npc_sprites)
+
+    # Update header with new offsets (relative to 0x10)
+    write_u32_le(out, 0x10, player_raster_pos - 0x10)
+    write_u32_le(out, 0x14, player_sprite_table_pos - 0x10)
+    write_u32_le(out, 0x18, npc_sprite_table_pos - 0x10)
+    write_u32_le(out, 0x1C, end_pos - 0x10)
 
     print(f"    Output: {len(out):,} bytes (was {len(data):,} compressed)")
 
-    return bytes(out)
+    return out
 
 # =============================================================================
 # MapFS Converter
@@ -503,85 +869,134 @@ def convert_shape_data(data: bytearray):
     if len(data) < 20:
         return
 
-    display_list_ptr = read_u32_be(data, 0)
-    group_list_ptr = read_u32_be(data, 4)
-    property_list_ptr = read_u32_be(data, 8)
-    vertex_list_ptr = read_u32_be(data, 12)
+    header = SHAPE_HEADER.unpack(data, 0)
+    display_list_ptr = header["display_list"]
+    group_list_ptr = header["group_list"]
+    property_list_ptr = header["property_list"]
+    vertex_list_ptr = header["vertex_list"]
 
-    swap32_range(data, 0, 5)
+    SHAPE_HEADER.swap(data, 0)
 
     ptrs = [p for p in [display_list_ptr, group_list_ptr, property_list_ptr, len(data)]
             if p > vertex_list_ptr and p < len(data)]
     vertex_end = min(ptrs) if ptrs else len(data)
 
     if vertex_list_ptr > 0 and vertex_list_ptr < len(data):
-        pos = vertex_list_ptr
-        while pos + 16 <= vertex_end:
-            swap16_range(data, pos, 6)
-            pos += 16
+        VTX.swap_array(data, vertex_list_ptr, (vertex_end - vertex_list_ptr) // VTX.size)
 
     if display_list_ptr > 0 and display_list_ptr < len(data):
-        pos = display_list_ptr
-        while pos + 8 <= len(data):
-            cmd = data[pos]
-            swap32(data, pos)
-            swap32(data, pos + 4)
-            if cmd == 0xDF:
-                break
-            pos += 8
-            if pos > display_list_ptr + 0x100000:
-                break
+        # Find the G_ENDDL (0xDF) command, then swap the whole list in one go
+        num_cmds = min(0x100000 // 8, (len(data) - display_list_ptr - 8) // 8) + 1
+        if num_cmds > 0:
+            end = data[display_list_ptr:display_list_ptr + num_cmds * 8:8].find(0xDF)
+            if end != -1:
+                num_cmds = end + 1
+            swap32_range(data, display_list_ptr, num_cmds * 2)
 
     if group_list_ptr > 0 and group_list_ptr < len(data):
-        convert_model_groups(data, group_list_ptr, set())
+        MODEL_GROUP.swap_tree(data, group_list_ptr)
 
     if property_list_ptr > 0 and property_list_ptr < len(data):
-        pos = property_list_ptr
-        while pos + 4 <= len(data):
-            val = read_u32_be(data, pos)
-            swap32(data, pos)
-            if val == 0:
-                break
-            pos += 4
-
-def convert_model_groups(data: bytearray, offset: int, visited: set):
-    if offset in visited or offset + 20 > len(data):
-        return
-    visited.add(offset)
-
-    child_ptr = read_u32_be(data, offset + 4)
-    sibling_ptr = read_u32_be(data, offset + 8)
-
-    swap32_range(data, offset, 5)
-
-    if child_ptr > 0 and child_ptr < len(data):
-        convert_model_groups(data, child_ptr, visited)
-    if sibling_ptr > 0 and sibling_ptr < len(data):
-        convert_model_groups(data, sibling_ptr, visited)
+        count = count_u32_until(data, property_list_ptr, lambda val: val == 0)
+        swap32_range(data, property_list_ptr, count)
 
 def convert_hit_data(data: bytearray):
     if len(data) < 4:
         return
 
-    pos = 0
-    offsets = []
-    while pos + 4 <= len(data):
-        val = read_u32_be(data, pos)
-        swap32(data, pos)
-        if val == 0 or val >= len(data):
-            break
-        offsets.append(val)
-        pos += 4
+    count = count_u32_until(data, 0, lambda val: val == 0 or val >= len(data))
+    offsets = [read_u32_be(data, i * 4) for i in range(count)]
+    if offsets and (offsets[-1] == 0 or offsets[-1] >= len(data)):
+        offsets.pop()
+    swap32_range(data, 0, count)
 
     for i, off in enumerate(offsets):
         end = offsets[i + 1] if i + 1 < len(offsets) else len(data)
         if off < end:
             swap16_range(data, off, (end - off) // 2)
 
+def tex_raster_size(w: int, h: int, depth: int) -> int:
+    if depth == 0: return w * h // 2
+    elif depth == 1: return w * h
+    elif depth == 2: return w * h * 2
+    else: return w * h * 4
+
+def tex_palette_size(fmt: int, depth: int) -> int:
+    if fmt == 2:
+        return 32 if depth == 0 else 512
+    return 0
+
+@functools.lru_cache(maxsize=None)
+def tex_swap_plan(aux_w: int, main_w: int, aux_h: int, main_h: int,
+                  extra_tiles: int, fmts: int, depths: int) -> Tuple[Tuple[SwapRun, ...], int]:
+    """Swap plan for one texture, relative to its header, and the offset of the next header.
+
+    Textures with the same dimensions and formats share a plan, so it is computed once per archive set.
+    """
+    main_fmt = fmts & 0xF
+    main_depth = depths & 0xF
+    aux_fmt = (fmts >> 4) & 0xF
+    aux_depth = (depths >> 4) & 0xF
+
+    plan: List[SwapRun] = list(TEX_HEADER.plan)
+
+    raster_start = TEX_HEADER.size
+    main_raster_sz = tex_raster_size(main_w, main_h, main_depth)
+    main_pal_sz = tex_palette_size(main_fmt, main_depth)
+
+    if main_fmt == 0:
+        if main_depth == 2:
+            plan.append((raster_start, 2, main_w * main_h))
+        elif main_depth == 3:
+            plan.append((raster_start, 4, main_w * main_h))
+
+    if main_fmt == 3 and main_depth == 2:
+        plan.append((raster_start, 2, main_w * main_h))
+
+    if main_fmt == 2:
+        pal_colors = 16 if main_depth == 0 else 256
+        plan.append((raster_start + main_raster_sz, 2, pal_colors))
+
+    if extra_tiles == 1:
+        mipmap_pos = raster_start + main_raster_sz
+        divisor = 2
+        while main_w // divisor >= (16 >> main_depth) and main_h // divisor > 0:
+            mm_w = main_w // divisor
+            mm_h = main_h // divisor
+            if main_fmt == 0 and main_depth == 2:
+                plan.append((mipmap_pos, 2, mm_w * mm_h))
+            mipmap_pos += tex_raster_size(mm_w, mm_h, main_depth)
+            divisor *= 2
+        if main_fmt == 2:
+            pal_colors = 16 if main_depth == 0 else 256
+            plan.append((mipmap_pos, 2, pal_colors))
+            main_pal_sz = pal_colors * 2
+
+    aux_start = raster_start + main_raster_sz + main_pal_sz
+
+    if extra_tiles == 2:
+        if main_fmt == 0 and main_depth == 2:
+            plan.append((aux_start, 2, main_w * (main_h // 2)))
+        aux_start += tex_raster_size(main_w, main_h // 2, main_depth)
+
+    elif extra_tiles == 3:
+        aux_raster_sz = tex_raster_size(aux_w, aux_h, aux_depth)
+
+        if aux_fmt in (0, 3) and aux_depth == 2:
+            plan.append((aux_start, 2, aux_w * aux_h))
+
+        if aux_fmt == 2:
+            pal_colors = 16 if aux_depth == 0 else 256
+            plan.append((aux_start + aux_raster_sz, 2, pal_colors))
+
+        aux_start += aux_raster_sz + tex_palette_size(aux_fmt, aux_depth)
+
+    return tuple(plan), (aux_start + 7) & ~7
+
 def convert_tex_data(data: bytearray):
     pos = 0
 
-    while pos + 48 <= len(data):
+    while TEX_HEADER.fits(data, pos):
         name_end = data[pos:pos+32].find(0)
         if name_end <= 0:
             break
@@ -593,92 +1008,14 @@ def convert_tex_data(data: bytearray):
         except:
             break
 
-        aux_w = read_u16_be(data, pos + 32)
-        main_w = read_u16_be(data, pos + 34)
-        aux_h = read_u16_be(data, pos + 36)
-        main_h = read_u16_be(data, pos + 38)
-        extra_tiles = data[pos + 41]
-        fmts = data[pos + 43]
-        depths = data[pos + 44]
-
-        main_fmt = fmts & 0xF
-        main_depth = depths & 0xF
-        aux_fmt = (fmts >> 4) & 0xF
-        aux_depth = (depths >> 4) & 0xF
-
-        swap16_range(data, pos + 32, 4)
-
-        def raster_size(w, h, depth):
-            if depth == 0: return w * h // 2
-            elif depth == 1: return w * h
-            elif depth == 2: return w * h * 2
-            else: return w * h * 4
-
-        def palette_size(fmt, depth):
-            if fmt == 2:
-                return 32 if depth == 0 else 512
-            return 0
-
-        raster_start = pos + 48
-        main_raster_sz = raster_size(main_w, main_h, main_depth)
-        main_pal_sz = palette_size(main_fmt, main_depth)
-
-        if main_fmt == 0:
-            if main_depth == 2:
-                swap16_range(data, raster_start, main_w * main_h)
-            elif main_depth == 3:
-                swap32_range(data, raster_start, main_w * main_h)
-
-        if main_fmt == 3 and main_depth == 2:
-            swap16_range(data, raster_start, main_w * main_h)
-
-        if main_fmt == 2:
-            pal_start = raster_start + main_raster_sz
-            pal_colors = 16 if main_depth == 0 else 256
-            swap16_range(data, pal_start, pal_colors)
-
-        if extra_tiles == 1:
-            mipmap_pos = raster_start + main_raster_sz
-            divisor = 2
-            while main_w // divisor >= (16 >> main_depth) and main_h // divisor > 0:
-                mm_w = main_w // divisor
-                mm_h = main_h // divisor
-                mm_sz = raster_size(mm_w, mm_h, main_depth)
-                if main_fmt == 0 and main_depth == 2:
-                    swap16_range(data, mipmap_pos, mm_w * mm_h)
-                mipmap_pos += mm_sz
-                divisor *= 2
-            if main_fmt == 2:
-                pal_colors = 16 if main_depth == 0 else 256
-                swap16_range(data, mipmap_pos, pal_colors)
-                main_pal_sz = pal_colors * 2
-
-        aux_start = raster_start + main_raster_sz + main_pal_sz
-
-        if extra_tiles == 2:
-            aux_raster_sz = raster_size(main_w, main_h // 2, main_depth)
-            if main_fmt == 0 and main_depth == 2:
-                swap16_range(data, aux_start, main_w * (main_h // 2))
-            aux_start += aux_raster_sz
-
-        elif extra_tiles == 3:
-            aux_raster_sz = raster_size(aux_w, aux_h, aux_depth)
-            aux_pal_sz = palette_size(aux_fmt, aux_depth)
-
-            if aux_fmt == 0 and aux_depth == 2:
-                swap16_range(data, aux_start, aux_w * aux_h)
-            elif aux_fmt == 3 and aux_depth == 2:
-                swap16_range(data, aux_start, aux_w * aux_h)
+        tex = TEX_HEADER.unpack(data, pos)
+        plan, next_pos = tex_swap_plan(tex["aux_width"], tex["main_width"], tex["aux_height"], tex["main_height"],
+                                       tex["extra_tiles"], tex["fmts"], tex["depths"])
+        apply_swap_plan(data, pos, plan)
 
-            if aux_fmt == 2:
-                pal_colors = 16 if aux_depth == 0 else 256
-                swap16_range(data, aux_start + aux_raster_sz, pal_colors)
-
-            aux_start += aux_raster_sz + aux_pal_sz
-
-        pos = (aux_start + 7) & ~7
-        if pos <= raster_start:
+        if next_pos <= TEX_HEADER.size:
             break
+        pos += next_pos
 
 def convert_bg_data(data: bytearray, pal_count: int = 1):
     if len(data) < 16:
@@ -689,14 +1026,14 @@ def convert_bg_data(data: bytearray, pal_count: int = 1):
         if header_off + 0x10 > len(data):
             break
 
-        raster_off_raw = read_u32_be(data, header_off)
-        pal_off_raw = read_u32_be(data, header_off + 4)
+        header = BG_HEADER.unpack(data, header_off)
+        raster_off_raw = header["raster"]
+        pal_off_raw = header["palette"]
 
         raster_off = raster_off_raw - 0x80200000 if raster_off_raw >= 0x80200000 else raster_off_raw
         pal_off = pal_off_raw - 0x80200000 if pal_off_raw >= 0x80200000 else pal_off_raw
 
-        swap32_range(data, header_off, 3)
-        swap16_range(data, header_off + 12, 2)
+        BG_HEADER.swap(data, header_off)
 
         if pal_off + 512 <= len(data):
             swap16_range(data, pal_off, 256)
@@ -736,28 +1073,63 @@ def convert_title_data(data: bytearray, textures: List):
                 if pal_pos + pal_size * 2 <= len(data):
                     swap16_range(data, pal_pos, pal_size)
 
-def convert_mapfs_entry(data: bytes, name: str, config: MapFSConfig) -> bytes:
+def mapfs_entry_class(name: str) -> str:
+    if name.endswith("_shape"):
+        return "_shape"
+    elif name.endswith("_hit"):
+        return "_hit"
+    elif name.endswith("_tex"):
+        return "_tex"
+    elif name.endswith("_bg"):
+        return "_bg"
+    elif name.startswith("party_"):
+        return "party_"
+    elif name == "title_data":
+        return "title_data"
+    return "other"
+
+def convert_mapfs_entry(data: Buffer, name: str, config: MapFSConfig) -> bytearray:
     out = bytearray(data)
+    entry_class = mapfs_entry_class(name)
 
-    if name.endswith("_shape"):
+    if entry_class == "_shape":
         convert_shape_data(out)
-    elif name.endswith("_hit"):
+    elif entry_class == "_hit":
         convert_hit_data(out)
-    elif name.endswith("_tex"):
+    elif entry_class == "_tex":
         convert_tex_data(out)
-    elif name.endswith("_bg"):
+    elif entry_class == "_bg":
         pal_count = config.get_pal_count(name)
         convert_bg_data(out, pal_count)
-    elif name.startswith("party_"):
+    elif entry_class == "party_":
         convert_party_data(out)
-    elif name == "title_data":
+    elif entry_class == "title_data":
         textures = config.get_textures(name)
         if textures:
             convert_title_data(out, textures)
 
-    return bytes(out)
+    return out
 
-def convert_mapfs_segment(data: bytes) -> bytes:
+def load_mapfs_entry(entry_data: Buffer, name: str, is_compressed: bool, config: MapFSConfig) -> bytearray:
+    if is_compressed and is_yay0(entry_data):
+        try:
+            entry_data = decompress_yay0(entry_data)
+        except Exception as e:
+            print(f"      Warning: {name}: {e}")
+
+    return convert_mapfs_entry(entry_data, name, config)
+
+def write_mapfs_file(name: str, entry_data: Buffer, is_compressed: bool, out_path: Path) -> Tuple[int, float]:
+    """Decompress, convert and write a single MapFS entry. Runs in a worker process when JOBS > 1.
+
+    Returns the converted size and the time spent, for the --profile report.
+    """
+    start_time = time.perf_counter()
+    entry_data = load_mapfs_entry(entry_data, name, is_compressed, get_mapfs_config())
+    out_path.write_bytes(entry_data)
+    return len(entry_data), time.perf_counter() - start_time
+
+def convert_mapfs_segment(data: Buffer) -> Buffer:
     config = get_mapfs_config()
 
     if len(data) < 0x40:
@@ -790,27 +1162,47 @@ def convert_mapfs_segment(data: bytes) -> bytes:
         maps_dir = OUT_DIR / "maps"
         maps_dir.mkdir(parents=True, exist_ok=True)
 
-        index_entries = []
+        cache = get_conversion_cache()
+        sizes: List[Optional[int]] = [None] * len(entries)
+        digests = []
+        jobs = []
+        job_indices = []
 
-        for entry in entries:
-            data_start = 0x20 + entry['offset']
-            data_end = data_start + entry['size']
-            entry_data = data[data_start:data_end]
+        for i, entry in enumerate(entries):
+            name = entry['name']
+            entry_data = data[0x20 + entry['offset']:0x20 + entry['offset'] + entry['size']]
+            out_path = maps_dir / f"{name}.bin"
+
+            digest = cache.digest("mapfs", name, entry_data, config.get(name))
+            digests.append(digest)
+            record = cache.lookup("mapfs", name, digest, [out_path])
+            if record is not None and output_size_matches(out_path, record["size"]):
+                sizes[i] = record["size"]
+                continue
 
-            is_compressed = entry['size'] != entry['decomp_size']
-            if is_compressed and is_yay0(entry_data):
-                try:
-                    entry_data = decompress_yay0(entry_data)
-                except Exception as e:
-                    print(f"      Warning: {entry['name']}: {e}")
+            jobs.append((name, entry_data, entry['size'] != entry['decomp_size'], out_path))
+            job_indices.append(i)
 
-            entry_data = convert_mapfs_entry(entry_data, entry['name'], config)
+        print(f"    {len(jobs)} entries to convert, {len(entries) - len(jobs)} up to date")
 
-            out_path = maps_dir / f"{entry['name']}.bin"
-            out_path.write_bytes(entry_data)
+        if jobs and JOBS > 1:
+            print(f"    Converting with {JOBS} jobs")
+            # memoryviews into the ROM mapping can't be pickled
+            jobs = [(name, bytes(entry_data), is_compressed, out_path)
+                    for name, entry_data, is_compressed, out_path in jobs]
+            with ProcessPoolExecutor(max_workers=JOBS) as pool:
+                job_results = list(pool.map(write_mapfs_file, *zip(*jobs), chunksize=8))
+        else:
+            job_results = [write_mapfs_file(*job) for job in jobs]
 
-            index_entries.append((entry['name'], len(entry_data)))
+        profiler = get_profiler()
+        for i, job, (size, seconds) in zip(job_indices, jobs, job_results):
+            profiler.record("mapfs", mapfs_entry_class(entries[i]['name']), seconds, len(job[1]), size)
+            sizes[i] = size
+            cache.store("mapfs", entries[i]['name'], digests[i], size=size)
 
+        # Results are placed by TOC position, so the index matches the TOC
+        index_entries = [(entry['name'], size) for entry, size in zip(entries, sizes)]
         write_mapfs_index(maps_dir, index_entries)
 
         print(f"    Wrote {len(entries)} individual files to {maps_dir}/")
@@ -830,16 +1222,11 @@ def convert_mapfs_segment(data: bytes) -> bytes:
         for i, entry in enumerate(entries):
             data_start = 0x20 + entry['offset']
             data_end = data_start + entry['size']
-            entry_data = data[data_start:data_end]
-
             is_compressed = entry['size'] != entry['decomp_size']
-            if is_compressed and is_yay0(entry_data):
-                try:
-                    entry_data = decompress_yay0(entry_data)
-                except Exception as e:
-                    print(f"      Warning: {entry['name']}: {e}")
-
-            entry_data = convert_mapfs_entry(entry_data, entry['name'], config)
+            start_time = time.perf_counter()
+            entry_data = load_mapfs_entry(data[data_start:data_end], entry['name'], is_compressed, config)
+            get_profiler().record("mapfs", mapfs_entry_class(entry['name']), time.perf_counter() - start_time,
+                                  entry['size'], len(entry_data))
 
             toc_pos = toc_start + i * 0x1C
             name_bytes = entry['name'].encode('ascii')[:15].ljust(16, b'\x00')
@@ -858,7 +1245,7 @@ def convert_mapfs_segment(data: bytes) -> bytes:
         out[toc_pos:toc_pos+16] = b'end_data\x00\x00\x00\x00\x00\x00\x00\x00'
         struct.pack_into("<III", out, toc_pos + 0x10, 0, 0, 0)
 
-        return bytes(out)
+        return out
 
 def write_mapfs_index(maps_dir: Path, entries: List[Tuple[str, int]]):
     header = """// Auto-generated map asset index
@@ -885,41 +1272,48 @@ static const MapAssetEntry gMapAssets[] = {
 #endif // MAP_ASSETS_H
 """ % len(entries))
 
+def output_size_matches(path: Path, size: int) -> bool:
+    """Cheap check that a cached output wasn't truncated or replaced since it was written"""
+    try:
+        return path.stat().st_size == size
+    except OSError:
+        return False
+
+def read_mapfs_index(maps_dir: Path) -> List[Tuple[str, int]]:
+    """Read back the (name, size) list written by write_mapfs_index, in TOC order"""
+    index_path = maps_dir / "map_assets.h"
+    if not index_path.exists():
+        return []
+    return [(m.group(1), int(m.group(2), 16))
+            for m in re.finditer(r'\{ "(\w+)", 0x([0-9A-F]+) \}', index_path.read_text())]
+
 # =============================================================================
 # Message Converter
 # =============================================================================
 
-def convert_msg_segment(data: bytes) -> bytes:
+def convert_msg_segment(data: Buffer) -> bytearray:
     out = bytearray(data)
 
-    section_offsets = []
-    pos = 0
-    while pos + 4 <= len(data):
-        off = read_u32_be(data, pos)
-        swap32(out, pos)
-        if off == 0:
-            break
-        section_offsets.append(off)
-        pos += 4
+    count = count_u32_until(data, 0, lambda off: off == 0)
+    section_offsets = [read_u32_be(data, i * 4) for i in range(count)]
+    if section_offsets and section_offsets[-1] == 0:
+        section_offsets.pop()
+    swap32_range(out, 0, count)
 
     for section_off in section_offsets:
         if section_off >= len(data):
             continue
-        pos = section_off
-        while pos + 4 <= len(data):
-            off = read_u32_be(data, pos)
-            swap32(out, pos)
-            if off == section_off:
-                break
-            pos += 4
+        # Each section's offset table ends with a repeat of the section start
+        count = count_u32_until(data, section_off, lambda off: off == section_off)
+        swap32_range(out, section_off, count)
 
-    return bytes(out)
+    return out
 
 # =============================================================================
 # Charset Converter
 # =============================================================================
 
-def convert_charset_segment(data: bytes) -> bytes:
+def convert_charset_segment(data: Buffer) -> bytearray:
     out = bytearray(data)
 
     if len(data) > 0x1000:
@@ -929,23 +1323,23 @@ def convert_charset_segment(data: bytes) -> bytes:
 
         palette_start = (estimated_raster_end + 15) & ~15
 
-        for pos in range(palette_start, len(data) - 1, 2):
-            swap16(out, pos)
+        swap16_range(out, palette_start, (len(data) - palette_start) // 2)
 
-    return bytes(out)
+    return out
 
 # =============================================================================
 # Icon Converter
 # =============================================================================
 
-def convert_icon_segment(data: bytes) -> bytes:
+def convert_icon_segment(data: Buffer) -> bytearray:
     config = get_icon_config()
-    out = bytearray(data)
 
     if not config.icons:
         print("    Warning: No icon config, using heuristic")
         return convert_icon_segment_heuristic(data)
 
+    out = bytearray(data)
+
     print(f"    Processing {len(config.icons)} icons")
 
     pos = 0
@@ -979,9 +1373,9 @@ def convert_icon_segment(data: bytes) -> bytes:
 
             pos += raster_size
 
-    return bytes(out)
+    return out
 
-def convert_icon_segment_heuristic(data: bytes) -> bytes:
+def convert_icon_segment_heuristic(data: Buffer) -> bytearray:
     out = bytearray(data)
 
     pos = 0
@@ -992,13 +1386,13 @@ def convert_icon_segment_heuristic(data: bytes) -> bytes:
             swap16_range(out, pos, 16)
         pos += 32
 
-    return bytes(out)
+    return out
 
 # =============================================================================
 # Logos Converter - Raw RGBA16 textures, just byte-swap
 # =============================================================================
 
-def convert_logos_segment(data: bytes) -> bytes:
+def convert_logos_segment(data: Buffer) -> bytearray:
     """Convert logos segment - raw RGBA16 texture data, swap every 16-bit word.
 
     Layout (from state_logos.c):
@@ -1020,13 +1414,24 @@ def convert_logos_segment(data: bytes) -> bytes:
         print(f"    Image3 (IS logo):        0x07000 - 0x15000  256x112")
         print(f"    Image2 (Nintendo logo):  0x15000 - 0x1B000  256x48")
 
-    return bytes(out)
+    return out
 
 # =============================================================================
 # VROM Table Generator
 # =============================================================================
 
+def sort_vrom_segments(segments: List[Tuple[str, int, int, int]]) -> List[Tuple[str, int, int, int]]:
+    """Sort segments by vrom_start and make sure no two ranges overlap, so lookups can binary search"""
+    ordered = sorted(segments, key=lambda seg: (seg[1], seg[2]))
+    for prev, cur in zip(ordered, ordered[1:]):
+        if cur[1] < prev[2]:
+            raise ValueError(f"VROM ranges overlap: {prev[0]} 0x{prev[1]:08X}-0x{prev[2]:08X} "
+                             f"and {cur[0]} 0x{cur[1]:08X}-0x{cur[2]:08X}")
+    return ordered
+
 def generate_vrom_table(segments: List[Tuple[str, int, int, int]], out_path: Path):
+    segments = sort_vrom_segments(segments)
+
     header = """// Auto-generated by convert_assets_le.py
 // Maps N64 ROM addresses to PC asset files
 
@@ -1042,24 +1447,34 @@ typedef struct {
     const char* filename;
 } VromEntry;
 
+// Sorted by vrom_start, ranges never overlap
 static const VromEntry gVromTable[] = {
 """
 
     footer = """    { 0, 0, 0, NULL }
 };
 
+#define VROM_TABLE_COUNT %d
+
 // Find VROM entry containing address
 static inline const VromEntry* vrom_find(u32 addr) {
-    int i;
-    for (i = 0; gVromTable[i].filename; i++) {
-        if (addr >= gVromTable[i].vrom_start && addr < gVromTable[i].vrom_end)
-            return &gVromTable[i];
+    int lo = 0;
+    int hi = VROM_TABLE_COUNT;
+    while (lo < hi) {
+        int mid = (lo + hi) / 2;
+        if (addr < gVromTable[mid].vrom_start) {
+            hi = mid;
+        } else if (addr >= gVromTable[mid].vrom_end) {
+            lo = mid + 1;
+        } else {
+            return &gVromTable[mid];
+        }
     }
     return NULL;
 }
 
 #endif // VROM_TABLE_H
-"""
+""" % len(segments)
 
     with open(out_path, 'w') as f:
         f.write(header)
@@ -1067,6 +1482,130 @@ static inline const VromEntry* vrom_find(u32 addr) {
             f.write(f'    {{ 0x{start:08X}, 0x{end:08X}, 0x{pc_size:X}, "{name}.bin" }},\n')
         f.write(footer)
 
+# =============================================================================
+# Asset Pack Writer
+# =============================================================================
+
+ASSET_PACK_MAGIC = b'PMLE'
+ASSET_PACK_VERSION = 2
+ASSET_PACK_HEADER = struct.Struct("<4sIIII12x") # magic, version, entry_count, vrom_count, data_offset
+ASSET_PACK_ENTRY = struct.Struct("<16sIIII")    # name, vrom_start, vrom_end, offset, size
+ASSET_PACK_ALIGN = 0x10
+ASSET_PACK_DATA_ALIGN = 0x1000
+
+def write_asset_pack(segments: List[Tuple[str, int, int, int]], out_path: Path):
+    """Pack every converted segment and split MapFS file into one mmappable archive.
+
+    Layout: header, a fixed-size index of ASSET_PACK_ENTRY records, then the blobs
+    starting on a page boundary, each ASSET_PACK_ALIGN aligned. The first vrom_count
+    entries are sorted by vrom_start for binary search. MapFS files follow them; they
+    are not VROM-addressable and have a zero vrom range, so look them up by name instead.
+    """
+    sources = [(name, start, end, OUT_DIR / f"{name}.bin", pc_size)
+               for name, start, end, pc_size in sort_vrom_segments(segments)]
+    vrom_count = len(sources)
+    maps_dir = OUT_DIR / "maps"
+    if SPLIT_MAPFS:
+        sources += [(name, 0, 0, maps_dir / f"{name}.bin", size) for name, size in read_mapfs_index(maps_dir)]
+
+    index_size = ASSET_PACK_HEADER.size + len(sources) * ASSET_PACK_ENTRY.size
+    data_offset = align(index_size, ASSET_PACK_DATA_ALIGN)
+
+    index = bytearray(data_offset)
+    ASSET_PACK_HEADER.pack_into(index, 0, ASSET_PACK_MAGIC, ASSET_PACK_VERSION, len(sources), vrom_count, data_offset)
+
+    pos = data_offset
+    for i, (name, start, end, path, size) in enumerate(sources):
+        ASSET_PACK_ENTRY.pack_into(index, ASSET_PACK_HEADER.size + i * ASSET_PACK_ENTRY.size,
+                                   name.encode('ascii')[:16], start, end, pos, size)
+        pos = align(pos + size, ASSET_PACK_ALIGN)
+
+    tmp_path = out_path.with_suffix(".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(index)
+        for name, start, end, path, size in sources:
+            blob = path.read_bytes()
+            if len(blob) != size:
+                raise ValueError(f"{path} is 0x{len(blob):X} bytes, expected 0x{size:X}")
+            f.write(blob)
+            f.write(b'\x00' * (align(size, ASSET_PACK_ALIGN) - size))
+    tmp_path.replace(out_path)
+
+    print(f"  {len(sources)} entries, {pos:,} bytes")
+
+def generate_asset_pack_header(out_path: Path):
+    header = f"""// Auto-generated by convert_assets_le.py
+// Layout of assets_le/assets.pak, a single little-endian archive meant to be mmapped
+
+#ifndef ASSET_PACK_H
+#define ASSET_PACK_H
+
+#include "types.h"
+#include <string.h>
+
+#define ASSET_PACK_MAGIC 0x{int.from_bytes(ASSET_PACK_MAGIC, 'little'):08X} // "{ASSET_PACK_MAGIC.decode()}"
+#define ASSET_PACK_VERSION {ASSET_PACK_VERSION}
+#define ASSET_PACK_ALIGN 0x{ASSET_PACK_ALIGN:X}
+#define ASSET_PACK_DATA_ALIGN 0x{ASSET_PACK_DATA_ALIGN:X}
+
+// Followed immediately by entry_count AssetPackEntry records
+typedef struct {{
+    u32 magic;
+    u32 version;
+    u32 entry_count;
+    u32 vrom_count;  // the first vrom_count entries are sorted by vrom_start
+    u32 data_offset; // first blob, ASSET_PACK_DATA_ALIGN aligned
+    u32 reserved[3];
+}} AssetPackHeader;
+
+typedef struct {{
+    char name[16];  // segment or MapFS file name, not always NUL-terminated
+    u32 vrom_start; // 0 for entries not addressed by VROM (MapFS files)
+    u32 vrom_end;
+    u32 offset;     // from the start of the pack, ASSET_PACK_ALIGN aligned
+    u32 size;
+}} AssetPackEntry;
+
+static inline const AssetPackEntry* asset_pack_entries(const AssetPackHeader* pack) {{
+    return (const AssetPackEntry*)(pack + 1);
+}}
+
+static inline const u8* asset_pack_data(const AssetPackHeader* pack, const AssetPackEntry* entry) {{
+    return (const u8*)pack + entry->offset;
+}}
+
+// Find the entry whose VROM range contains addr
+static inline const AssetPackEntry* asset_pack_find(const AssetPackHeader* pack, u32 addr) {{
+    const AssetPackEntry* entries = asset_pack_entries(pack);
+    u32 lo = 0;
+    u32 hi = pack->vrom_count;
+    while (lo < hi) {{
+        u32 mid = (lo + hi) / 2;
+        if (addr < entries[mid].vrom_start) {{
+            hi = mid;
+        }} else if (addr >= entries[mid].vrom_end) {{
+            lo = mid + 1;
+        }} else {{
+            return &entries[mid];
+        }}
+    }}
+    return NULL;
+}}
+
+static inline const AssetPackEntry* asset_pack_find_name(const AssetPackHeader* pack, const char* name) {{
+    const AssetPackEntry* entries = asset_pack_entries(pack);
+    u32 i;
+    for (i = 0; i < pack->entry_count; i++) {{
+        if (strncmp(entries[i].name, name, sizeof(entries[i].name)) == 0)
+            return &entries[i];
+    }}
+    return NULL;
+}}
+
+#endif // ASSET_PACK_H
+"""
+    out_path.write_text(header)
+
 # =============================================================================
 # Main
 # =============================================================================
@@ -1083,6 +1622,25 @@ CONVERTERS = {
 SEGMENTS = ['sprite', 'mapfs', 'msg', 'charset', 'icon', 'logos']
 
 def main():
+    global JOBS, USE_CACHE, WRITE_PACK, PROFILE_PATH
+
+    parser = argparse.ArgumentParser(description="Convert Paper Mario N64 assets to Little Endian for PC")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Worker processes for MapFS and sprite conversion (0 = all cores)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"Reconvert everything, ignoring {CACHE_DIR}")
+    parser.add_argument("--pack", action="store_true",
+                        help=f"Also write every output into a single mmappable {OUT_DIR}/assets.pak "
+                             "(runs without --pack delete it, so it never shadows newer loose files)")
+    parser.add_argument("--profile", nargs="?", type=Path, const=OUT_DIR / "profile.json", metavar="JSON",
+                        help=f"Write per-segment and per-MapFS-class timings (default: {OUT_DIR}/profile.json)")
+    args = parser.parse_args()
+
+    JOBS = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    USE_CACHE = not args.no_cache
+    WRITE_PACK = args.pack
+    PROFILE_PATH = args.profile
+
     print("Paper Mario Asset Converter (BE -> LE)")
     print("=" * 50)
 
@@ -1109,9 +1667,12 @@ def main():
     print(f"  Found {len(symbols)} symbols")
 
     print(f"\nLoading {ROM_PATH}...")
-    rom_data = ROM_PATH.read_bytes()
+    with open(ROM_PATH, "rb") as rom_file:
+        # The mapping outlives the file handle; segments are zero-copy views into it
+        rom_data = memoryview(mmap.mmap(rom_file.fileno(), 0, access=mmap.ACCESS_READ))
     print(f"  {len(rom_data):,} bytes")
 
+    cache = get_conversion_cache()
     converted = []
 
     for seg_name in SEGMENTS:
@@ -1127,37 +1688,81 @@ def main():
 
         seg_data = rom_data[start:end]
 
+        out_path = OUT_DIR / f"{seg_name}.bin"
+        if seg_name == 'mapfs' and SPLIT_MAPFS:
+            # Every split map file is an output too, so a missing or truncated one sends mapfs
+            # through the per-entry pass, which regenerates just that file
+            maps_dir = OUT_DIR / "maps"
+            map_files = [(maps_dir / f"{name}.bin", size) for name, size in read_mapfs_index(maps_dir)]
+            outputs = [maps_dir / "map_assets.h"] + [path for path, _ in map_files]
+        else:
+            map_files = []
+            outputs = [out_path]
+        digest = cache.digest("segment", seg_name, SPLIT_MAPFS, seg_data, read_segment_config(seg_name))
+        record = cache.lookup("segment", seg_name, digest, outputs)
+        if record is not None and not all(output_size_matches(path, size) for path, size in map_files):
+            record = None
+        if record is not None:
+            print(f"  Up to date")
+            if record["size"] > 0:
+                converted.append((seg_name, start, end, record["size"]))
+            continue
+
+        start_time = time.perf_counter()
+        # Forget objects touched by an earlier segment that failed, so they aren't credited to this one
+        cache.take_used_objects()
         try:
             result = converter(seg_data)
+            get_profiler().record("segment", seg_name, time.perf_counter() - start_time, len(seg_data), len(result))
             if len(result) > 0:
                 print(f"  Output: {len(result):,} bytes")
-                out_path = OUT_DIR / f"{seg_name}.bin"
                 out_path.write_bytes(result)
                 converted.append((seg_name, start, end, len(result)))
                 print(f"  Wrote: {out_path}")
             else:
                 print(f"  Output: individual files (see subdirectory)")
+            cache.store("segment", seg_name, digest, size=len(result), objects=cache.take_used_objects())
         except Exception as e:
             print(f"  ERROR: {e}")
             import traceback
             traceback.print_exc()
             result = seg_data
-            out_path = OUT_DIR / f"{seg_name}.bin"
             out_path.write_bytes(result)
             converted.append((seg_name, start, end, len(result)))
 
+    cache.save()
+
     print(f"\nGenerating vrom_table.h...")
     generate_vrom_table(converted, OUT_DIR / "vrom_table.h")
 
     print(f"Generating pc_rom_addrs.ld...")
     generate_linker_symbols(converted, symbols, OUT_DIR / "pc_rom_addrs.ld")
 
+    print(f"Generating asset_pack.h...")
+    generate_asset_pack_header(OUT_DIR / "asset_pack.h")
+
+    pack_path = OUT_DIR / "assets.pak"
+    if WRITE_PACK:
+        print(f"Writing assets.pak...")
+        write_asset_pack(converted, pack_path)
+    elif pack_path.exists():
+        # The runtime prefers the pack over the loose files, so a pack from an earlier --pack run would shadow them
+        print(f"Removing stale assets.pak...")
+        pack_path.unlink()
+
+    if PROFILE_PATH is not None:
+        print(f"Writing {PROFILE_PATH}...")
+        get_profiler().write(PROFILE_PATH)
+
     print("\n" + "=" * 50)
     print(f"Done! Output directory: {OUT_DIR}/")
     print("\nGenerated files:")
     for name, _, _, size in converted:
         print(f"  {name}.bin ({size:,} bytes)")
     print(f"  vrom_table.h")
+    print(f"  asset_pack.h")
+    if WRITE_PACK:
+        print(f"  assets.pak")
 
     return 0
 
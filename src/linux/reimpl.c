@@ -5,7 +5,12 @@
 #include <stdio.h>
 #include <stdarg.h>
 #include <stdlib.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
 #include "../assets_le/vrom_table.h"
+#include "../assets_le/asset_pack.h"
 
 // RSP microcode - dummy addresses
 u8 gspF3DZEX2_NoN_PosLight_fifoTextStart[1];
@@ -286,7 +291,43 @@ void osUnmapTLB(s32 index) {
 
 
 
+static const AssetPackHeader* sAssetPack = NULL;
+static s32 sAssetPackChecked = FALSE;
+
+// Map assets_le/assets.pak if it was generated (pc_assets.py --pack), otherwise loose files are used
+static const AssetPackHeader* asset_pack_get(void) {
+    struct stat st;
+    void* map;
+    s32 fd;
+
+    if (sAssetPackChecked) {
+        return sAssetPack;
+    }
+    sAssetPackChecked = TRUE;
+
+    fd = open("assets_le/assets.pak", O_RDONLY);
+    if (fd < 0) {
+        return NULL;
+    }
+
+    if (fstat(fd, &st) == 0 && st.st_size >= (off_t)sizeof(AssetPackHeader)) {
+        map = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+        if (map != MAP_FAILED) {
+            const AssetPackHeader* pack = map;
+            if (pack->magic == ASSET_PACK_MAGIC && pack->version == ASSET_PACK_VERSION) {
+                sAssetPack = pack;
+            } else {
+                printf("nuPiReadRom: assets.pak has a bad header, ignoring it\n");
+                munmap(map, st.st_size);
+            }
+        }
+    }
+    close(fd);
+    return sAssetPack;
+}
+
 void nuPiReadRom(u32 rom_addr, void* buf_ptr, u32 size) {
+    const AssetPackHeader* pack;
     const VromEntry* entry;
     u32 offset;
     char path[256];
@@ -298,6 +339,22 @@ void nuPiReadRom(u32 rom_addr, void* buf_ptr, u32 size) {
         return;
     }
 
+    pack = asset_pack_get();
+    if (pack) {
+        const AssetPackEntry* packEntry = asset_pack_find(pack, rom_addr);
+
+        if (packEntry) {
+            offset = rom_addr - packEntry->vrom_start;
+            if (offset < packEntry->size) {
+                if (size > packEntry->size - offset) {
+                    size = packEntry->size - offset;
+                }
+                memcpy(buf_ptr, asset_pack_data(pack, packEntry) + offset, size);
+            }
+            return;
+        }
+    }
+
     entry = vrom_find(rom_addr);
 
     if (!entry) {
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Benchmark the pc_assets.py converters against synthetic inputs, so converter
+performance can be tracked without a ROM.
+
+Usage:
+    python3 tools/bench_pc_assets.py [--repeat N] [--scale N] [--json OUT]
+"""
+
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(script_dir, ".."))
+sys.path.insert(0, root_dir)
+
+import pc_assets
+
+# =============================================================================
+# Synthetic Inputs
+# =============================================================================
+
+
+def random_bytes(rng: random.Random, size: int) -> bytes:
+    return rng.getrandbits(size * 8).to_bytes(size, "big") if size > 0 else b""
+
+
+def make_shape(rng: random.Random, scale: int) -> bytes:
+    num_vtx = 2000 * scale
+    num_cmds = 2000 * scale
+    num_groups = 200 * scale
+
+    vtx_off = 0x20
+    dl_off = vtx_off + num_vtx * 16
+    group_off = dl_off + num_cmds * 8
+    prop_off = group_off + num_groups * 20
+    out = bytearray(prop_off + 64)
+
+    struct.pack_into(">5I", out, 0, dl_off, group_off, prop_off, vtx_off, 0)
+    out[vtx_off:dl_off] = random_bytes(rng, dl_off - vtx_off)
+    for i in range(num_cmds):
+        out[dl_off + i * 8] = 0xDF if i == num_cmds - 1 else 0x01
+    for i in range(num_groups):
+        # Each group's sibling is the next one
+        sibling = group_off + (i + 1) * 20 if i + 1 < num_groups else 0
+        struct.pack_into(">5I", out, group_off + i * 20, 5, 0, sibling, 0, 0)
+    for i in range(15):
+        struct.pack_into(">I", out, prop_off + i * 4, i + 1)
+    return bytes(out)
+
+
+def make_hit(rng: random.Random, scale: int) -> bytes:
+    num_blocks = 16
+    block_size = 0x4000 * scale
+    table_size = (num_blocks + 1) * 4
+    out = bytearray(table_size)
+    for i in range(num_blocks):
+        struct.pack_into(">I", out, i * 4, table_size + i * block_size)
+    out += random_bytes(rng, num_blocks * block_size)
+    return bytes(out)
+
+
+def make_tex(rng: random.Random, scale: int) -> bytes:
+    out = bytearray()
+    # (fmt, depth) pairs: rgba16, rgba32, ci4, ci8, ia16
+    formats = [(0, 2), (0, 3), (2, 0), (2, 1), (3, 2)]
+    for i in range(100 * scale):
+        fmt, depth = formats[i % len(formats)]
+        w = h = 32
+        header = bytearray(48)
+        name = f"tex_{i:04}".encode()
+        header[0 : len(name)] = name
+        struct.pack_into(">4H", header, 32, 0, w, 0, h)
+        header[43] = fmt
+        header[44] = depth
+        raster_size = pc_assets.tex_raster_size(w, h, depth) + pc_assets.tex_palette_size(fmt, depth)
+        out += header + random_bytes(rng, raster_size)
+        out += b"\x00" * ((8 - len(out) % 8) % 8)
+    return bytes(out)
+
+
+def make_bg(rng: random.Random, scale: int) -> bytes:
+    w, h = 296 * scale, 200
+    raster_off = 0x10
+    pal_off = raster_off + w * h
+    out = bytearray(pal_off + 512)
+    struct.pack_into(">3I2H", out, 0, 0x80200000 + raster_off, 0x80200000 + pal_off, 0, w, h)
+    out[raster_off:] = random_bytes(rng, len(out) - raster_off)
+    return bytes(out)
+
+
+def make_msg(rng: random.Random, scale: int) -> bytes:
+    num_sections = 40
+    msgs_per_section = 100 * scale
+    section_size = (msgs_per_section + 1) * 4 + msgs_per_section * 32
+    table_size = (num_sections + 1) * 4
+    out = bytearray(table_size + num_sections * section_size)
+    for s in range(num_sections):
+        section_off = table_size + s * section_size
+        struct.pack_into(">I", out, s * 4, section_off)
+        for m in range(msgs_per_section):
+            struct.pack_into(">I", out, section_off + m * 4, section_off + (msgs_per_section + 1) * 4 + m * 32)
+        struct.pack_into(">I", out, section_off + msgs_per_section * 4, section_off)
+    return bytes(out)
+
+
+def make_sprite(rng: random.Random, num_rasters: int) -> bytes:
+    """Minimal well-formed sprite: one animation with one component, num_rasters CI4 rasters, one palette"""
+    anim_list = 0x10
+    comp_list = anim_list + 8
+    comp = comp_list + 8
+    cmds = comp + 12
+    raster_list = cmds + 32
+    rasters = raster_list + (num_rasters + 1) * 4
+    raster_data = rasters + num_rasters * 8
+    raster_size = 32 * 32 // 2
+    pal_list = raster_data + num_rasters * raster_size
+    pal = pal_list + 8
+    out = bytearray(pal + 32)
+
+    struct.pack_into(">4I", out, 0, raster_list, pal_list, 1, 0)
+    struct.pack_into(">Ii", out, anim_list, comp_list, -1)
+    struct.pack_into(">Ii", out, comp_list, comp, -1)
+    struct.pack_into(">IH3H", out, comp, cmds, 32, 0, 0, 0)
+    for i in range(num_rasters):
+        struct.pack_into(">I", out, raster_list + i * 4, rasters + i * 8)
+        struct.pack_into(">I4B", out, rasters + i * 8, raster_data + i * raster_size, 32, 32, 0, 0)
+    struct.pack_into(">i", out, raster_list + num_rasters * 4, -1)
+    out[raster_data:pal_list] = random_bytes(rng, pal_list - raster_data)
+    struct.pack_into(">Ii", out, pal_list, pal, -1)
+    out[pal:] = random_bytes(rng, 32)
+    return bytes(out)
+
+
+def make_sprites_segment(rng: random.Random, scale: int) -> bytes:
+    if not pc_assets.HAS_CRUNCH64:
+        return b""
+
+    import crunch64
+
+    player = [crunch64.yay0.compress(make_sprite(rng, 40 * scale)) for _ in range(14)]
+    npcs = [crunch64.yay0.compress(make_sprite(rng, 8 * scale)) for _ in range(50 * scale)]
+
+    raster_table = struct.pack(">3I", 12, 12, 12)
+    out = bytearray(0x20)
+    raster_off = len(out)
+    out += raster_table
+
+    player_off = len(out)
+    offsets = []
+    blob = bytearray()
+    for sprite in player:
+        offsets.append(14 * 4 + len(blob))
+        blob += sprite
+        blob += b"\x00" * ((4 - len(blob) % 4) % 4)
+    out += struct.pack(">14I", *offsets) + blob
+
+    npc_off = len(out)
+    offsets = []
+    blob = bytearray()
+    for sprite in npcs:
+        offsets.append((len(npcs) + 1) * 4 + len(blob))
+        blob += sprite
+        blob += b"\x00" * ((4 - len(blob) % 4) % 4)
+    out += struct.pack(f">{len(npcs) + 1}I", *offsets, 0) + blob
+
+    struct.pack_into(">4I", out, 0x10, raster_off - 0x10, player_off - 0x10, npc_off - 0x10, len(out) - 0x10)
+    return bytes(out)
+
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+
+
+def in_place(converter: Callable[[bytearray], None]) -> Callable[[bytes], bytearray]:
+    def run(data: bytes) -> bytearray:
+        out = bytearray(data)
+        converter(out)
+        return out
+
+    return run
+
+
+def benchmarks(scale: int) -> List[Tuple[str, Callable, bytes]]:
+    rng = random.Random(0x50415045)
+    cases = [
+        ("logos", pc_assets.convert_logos_segment, random_bytes(rng, 0x1B000 * scale)),
+        ("charset", pc_assets.convert_charset_segment, random_bytes(rng, 0x20000 * scale)),
+        ("icon_heuristic", pc_assets.convert_icon_segment_heuristic, random_bytes(rng, 0x40000 * scale)),
+        ("msg", pc_assets.convert_msg_segment, make_msg(rng, scale)),
+        ("mapfs_shape", in_place(pc_assets.convert_shape_data), make_shape(rng, scale)),
+        ("mapfs_hit", in_place(pc_assets.convert_hit_data), make_hit(rng, scale)),
+        ("mapfs_tex", in_place(pc_assets.convert_tex_data), make_tex(rng, scale)),
+        ("mapfs_bg", in_place(pc_assets.convert_bg_data), make_bg(rng, scale)),
+        ("mapfs_party", in_place(pc_assets.convert_party_data), random_bytes(rng, 0x10000 * scale)),
+    ]
+
+    sprites = make_sprites_segment(rng, scale)
+    if sprites:
+        cases.append(("sprite", pc_assets.convert_sprites_segment, sprites))
+    else:
+        print("Skipping sprite benchmark: crunch64 not installed")
+
+    return cases
+
+
+def run_benchmark(converter: Callable, data: bytes, repeat: int) -> Dict[str, float]:
+    best = None
+    out_size = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = converter(memoryview(data))
+        elapsed = time.perf_counter() - start_time
+        out_size = len(result)
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {
+        "seconds": round(best, 6),
+        "bytes_in": len(data),
+        "bytes_out": out_size,
+        "mb_per_s": round(len(data) / best / 1e6, 3) if best > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pc_assets.py converters on synthetic inputs")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per converter, the best time is reported")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply synthetic input sizes")
+    parser.add_argument("--json", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    # Converters print progress; keep them quiet and away from the real cache
+    pc_assets.USE_CACHE = False
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir, open(os.devnull, "w") as devnull:
+        pc_assets.OUT_DIR = Path(tmp_dir)
+        for name, converter, data in benchmarks(args.scale):
+            stdout = sys.stdout
+            sys.stdout = devnull
+            try:
+                results[name] = run_benchmark(converter, data, args.repeat)
+            finally:
+                sys.stdout = stdout
+
+    print(f"{'converter':<16} {'bytes in':>12} {'seconds':>10} {'MB/s':>10}")
+    for name, stats in results.items():
+        mb_per_s = f"{stats['mb_per_s']:.1f}" if stats["mb_per_s"] is not None else "-"
+        print(f"{name:<16} {stats['bytes_in']:>12,} {stats['seconds']:>10.4f} {mb_per_s:>10}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from functools import lru_cache
 from itertools import zip_longest
 import os
+import tempfile
 from pathlib import Path
 from typing import Tuple
 
@@ -19,3 +20,24 @@ def get_asset_path(asset: Path, asset_stack: Tuple[Path, ...]) -> Path:
 def iter_in_groups(iterable, n, fillvalue=None):
     args = [iter(iterable)] * n
     return zip_longest(*args, fillvalue=fillvalue)
+
+
+def write_if_changed(path, data: bytes) -> bool:
+    """Atomically replace path with data unless it already holds exactly that, so ninja's restat can skip dependents.
+    Returns whether the file was written."""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""
+A directory of cache entries, one file per key, bounded by total size.
+
+Hits bump an entry's mtime, and once the directory grows past its size limit the least recently used entries are
+evicted. Entries are written atomically, so concurrent builds can share a cache.
+"""
+
+import os
+import random
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+# Eviction walks the whole cache, so only a random sample of stores pay for it
+PRUNE_CHANCE = 1 / 32
+
+
+class FileCache:
+    def __init__(self, directory: Path, suffix: str, max_size: int):
+        self.directory = directory
+        self.suffix = suffix
+        self.max_size = max_size
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def load(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def store(self, key: str, data: bytes):
+        path = self.path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so concurrent builds never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        if random.random() < PRUNE_CHANCE:
+            self.prune()
+
+    def prune(self, max_size: Optional[int] = None):
+        """Delete least recently used entries until the cache fits in max_size bytes (default: its size limit)"""
+        if max_size is None:
+            max_size = self.max_size
+
+        entries = []
+        total = 0
+        for path in self.directory.glob(f"*/*{self.suffix}"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
@@ -7,7 +7,7 @@ from typing import Dict, Tuple
 from common import get_asset_path
 import xml.etree.ElementTree as ET
 from img.build import Converter
-import png
+from img.png_info import read_png_palette
 
 
 def get_img_file(fmt_str, img_file: str):
@@ -23,9 +23,7 @@ def get_img_file(fmt_str, img_file: str):
 
     out_pal = bytearray()
     if fmt_str == "CI4" or fmt_str == "CI8":
-        img = png.Reader(img_file)
-        img.preamble(True)
-        palette = img.palette(alpha="force")
+        palette = read_png_palette(img_file)
         for rgba in palette:
             if rgba[3] not in (0, 0xFF):
                 print("alpha mask mode but translucent pixels used")
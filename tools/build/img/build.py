@@ -3,8 +3,30 @@
 from sys import argv, stderr
 from math import floor, ceil
 from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import json
+import os
+import sys
 import png  # type: ignore
 
+# Also imported as img.build by icons.py and tex_archives.py, so import the header module the same way
+sys.path.append(str(Path(__file__).parent.parent))
+from common import write_if_changed
+from img.header import header_source
+from img.png_cache import read_png
+from img.png_info import read_png_palette
+
+try:
+    import numpy as np  # type: ignore
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Modes Converter.convert_vectorized handles when numpy is available
+VECTORIZED_MODES = ("rgba16", "ci4", "ia4", "ia8", "ia16", "i4", "i8")
+
 
 def unpack_color(s):
     r = (s >> 11) & 0x1F
@@ -62,7 +84,105 @@ class Converter:
             self.warned = True
             print(self.infile + ": warning: " + msg, file=stderr)
 
+    def warn_first(self, checks):
+        """Warns with whichever check the per-pixel loop would hit first.
+
+        checks is a list of (mask, message) over the same units (pixels or pixel pairs), in the order the loop
+        tests them for each unit.
+        """
+        first = None
+        for mask, msg in checks:
+            hits = np.flatnonzero(mask)
+            if hits.size and (first is None or hits[0] < first[0]):
+                first = (hits[0], msg)
+
+        if first is not None:
+            self.warn(first[1])
+
+    def convert_vectorized(self):
+        """Whole-image numpy version of convert() for the per-pixel modes, or None if it can't be used"""
+        if not HAS_NUMPY or self.mode not in VECTORIZED_MODES:
+            return None
+
+        if self.mode == "ci4":
+            decoded = read_png(self.infile)
+            (out_width, out_height, bitdepth) = (decoded.width, decoded.height, decoded.bitdepth)
+            raster = decoded.raster
+            channels = decoded.planes
+        else:
+            (out_width, out_height, data, info) = png.Reader(self.infile).asRGBA()
+            bitdepth = info["bitdepth"]
+            channels = 4
+
+        # Odd widths and 16-bit channels are left to the per-pixel path
+        if bitdepth > 8 or (self.mode in ("ci4", "ia4", "i4") and out_width % 2 != 0):
+            return None
+
+        if self.mode != "ci4":
+            raster = b"".join(data)
+
+        pixels = np.frombuffer(raster, dtype=np.uint8).reshape(out_height, out_width * channels)
+        if self.flip_y:
+            pixels = pixels[::-1]
+
+        if self.mode == "ci4":
+            indices = pixels.reshape(-1).astype(np.uint16)
+            out = ((indices[0::2] << 4) | indices[1::2]) & 0xFF
+            return (bytearray(out.astype(np.uint8).tobytes()), out_width, out_height)
+
+        rgba = pixels.reshape(-1, 4).astype(np.int64)
+        r, g, b, a = rgba[:, 0], rgba[:, 1], rgba[:, 2], rgba[:, 3]
+
+        translucent = (a != 0) & (a != 0xFF)
+        # Matches the chained r != g != b test of the per-pixel path
+        not_grayscale = (r != g) & (g != b)
+        intensity = np.round(r * 0.2126 + g * 0.7152 + 0.0722 * b).astype(np.int64)
+
+        if self.mode == "rgba16":
+            self.warn_first([(translucent, "alpha mask mode but translucent pixels used")])
+            out = ((r >> 3) << 11) | ((g >> 3) << 6) | ((b >> 3) << 1) | (a >> 7)
+            out = out.astype(">u2")
+        elif self.mode == "ia4":
+            self.warn_first(
+                [
+                    (translucent.reshape(-1, 2).any(axis=1), "alpha mask mode but translucent pixels used"),
+                    (not_grayscale.reshape(-1, 2).any(axis=1), "grayscale mode but image is not"),
+                ]
+            )
+            nibbles = ((intensity >> 5) << 1) | (a > 128)
+            out = ((nibbles[0::2] << 4) | nibbles[1::2]).astype(np.uint8)
+        elif self.mode == "ia8":
+            self.warn_first([(not_grayscale, "grayscale mode but image is not")])
+            i = np.floor(15 * (intensity / 0xFF)).astype(np.int64)
+            a = np.floor(15 * (a / 0xFF)).astype(np.int64)
+            out = ((i << 4) | a).astype(np.uint8)
+        elif self.mode == "ia16":
+            self.warn_first([(not_grayscale, "grayscale mode but image is not")])
+            out = np.stack((intensity, a), axis=1).astype(np.uint8)
+        elif self.mode == "i4":
+            self.warn_first(
+                [
+                    ((a != 0xFF).reshape(-1, 2).any(axis=1), "discarding alpha channel"),
+                    (not_grayscale.reshape(-1, 2).any(axis=1), "grayscale mode but image is not"),
+                ]
+            )
+            i = np.floor(15 * (intensity / 0xFF)).astype(np.int64)
+            out = ((i[0::2] << 4) | i[1::2]).astype(np.uint8)
+        else:  # i8
+            self.warn_first(
+                [(a != 0xFF, "discarding alpha channel"), (not_grayscale, "grayscale mode but image is not")]
+            )
+            out = intensity.astype(np.uint8)
+
+        return (bytearray(out.tobytes()), out_width, out_height)
+
     def convert(self):
+        vectorized = self.convert_vectorized()
+        if vectorized is not None:
+            return vectorized
+        return self.convert_scalar()
+
+    def convert_scalar(self):
         out_bytes = bytearray()
         out_width = 0
         out_height = 0
@@ -82,19 +202,20 @@ class Converter:
                     color = pack_color(*rgba)
                     out_bytes += color.to_bytes(2, byteorder="big")
         elif self.mode == "ci8":
-            (out_width, out_height, data, info) = img.read()
+            decoded = read_png(self.infile)
+            (out_width, out_height, data) = (decoded.width, decoded.height, decoded.rows())
             for row in reversed_if(data, self.flip_y):
                 out_bytes += row
         elif self.mode == "ci4":
-            (out_width, out_height, data, info) = img.read()
+            decoded = read_png(self.infile)
+            (out_width, out_height, data) = (decoded.width, decoded.height, decoded.rows())
             for row in reversed_if(data, self.flip_y):
                 for a, b in iter_in_groups(row, 2):
                     byte = (a << 4) | b
                     byte = byte & 0xFF
                     out_bytes += byte.to_bytes(1, byteorder="big")
         elif self.mode == "palette":
-            img.preamble(True)
-            palette = img.palette(alpha="force")
+            palette = read_png_palette(self.infile)
 
             for rgba in palette:
                 if rgba[3] not in (0, 0xFF):
@@ -188,9 +309,9 @@ class Converter:
                     i = rgb_to_intensity(*rgba[:3])
                     out_bytes += i.to_bytes(1, byteorder="big")
         elif self.mode == "party":
-            (out_width, out_height, data, info) = img.read()
-            img.preamble(True)
-            palette = img.palette(alpha="force")
+            decoded = read_png(self.infile)
+            (out_width, out_height, data) = (decoded.width, decoded.height, decoded.rows())
+            palette = decoded.palette
 
             # palette
             for rgba in palette:
@@ -206,14 +327,12 @@ class Converter:
 
             out_bytes += b"\0\0\0\0\0\0\0\0\0\0"  # padding
         elif self.mode == "bg":
-            (out_width, out_height, data, info) = img.read()
-            img.preamble(True)
-            palettes = [img.palette(alpha="force")]
+            decoded = read_png(self.infile)
+            (out_width, out_height, data) = (decoded.width, decoded.height, decoded.rows())
+            palettes = [decoded.palette]
 
             for palettepath in glob(self.infile.split(".")[0] + ".*.png"):
-                pal = png.Reader(palettepath)
-                pal.preamble(True)
-                palettes.append(pal.palette(alpha="force"))
+                palettes.append(read_png_palette(palettepath))
 
             baseaddr = 0x80200000  # gBackgroundImage
             headers_len = 0x10 * len(palettes)
@@ -247,9 +366,88 @@ class Converter:
         return (out_bytes, out_width, out_height)
 
 
+def run_job(job):
+    """Runs one manifest job: [MODE, INFILE, OUTFILE, FLAG...], where MODE "header" writes img/header.py's output"""
+    mode, infile, outfile, *flags = job
+
+    if mode == "header":
+        data = header_source(infile, flags[0] if flags else "").encode("utf-8")
+    else:
+        (data, _, _) = Converter(mode, infile, "--flip-x" in flags, "--flip-y" in flags).convert()
+
+    os.makedirs(os.path.dirname(outfile) or ".", exist_ok=True)
+    write_if_changed(outfile, data)
+
+
+def read_manifest(path):
+    """The manifest is a JSON array of jobs, each one [MODE, INFILE, OUTFILE, FLAG...]"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_batch(jobs, num_workers):
+    # Small batches aren't worth a pool's startup cost
+    num_workers = min(num_workers, (len(jobs) + 31) // 32)
+
+    if num_workers <= 1:
+        for job in jobs:
+            run_job(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        for _ in pool.map(run_job, jobs, chunksize=8):
+            pass
+
+
+def check_vectorized(infile, flip_y: bool = False):
+    """Returns the modes in which convert_vectorized's output or warning differs from the per-pixel path's for infile"""
+    mismatches = []
+    for mode in VECTORIZED_MODES:
+        vectorized_converter = Converter(mode, infile, flip_y=flip_y)
+        vectorized_warnings = []
+        vectorized_converter.warn = vectorized_warnings.append
+        vectorized = vectorized_converter.convert_vectorized()
+        if vectorized is None:
+            continue
+
+        scalar_converter = Converter(mode, infile, flip_y=flip_y)
+        scalar_warnings = []
+        scalar_converter.warn = scalar_warnings.append
+        scalar = scalar_converter.convert_scalar()
+
+        # Only the first warning is ever printed
+        if vectorized != scalar or vectorized_warnings[:1] != scalar_warnings[:1]:
+            mismatches.append(mode)
+    return mismatches
+
+
 if __name__ == "__main__":
+    if len(argv) >= 2 and argv[1] == "--check-vectorized":
+        if not HAS_NUMPY:
+            print("--check-vectorized needs numpy", file=stderr)
+            exit(1)
+
+        failed = False
+        for infile in argv[2:]:
+            for flip_y in (False, True):
+                for mode in check_vectorized(infile, flip_y):
+                    print(f"{infile}: {mode}{' --flip-y' if flip_y else ''}: vectorized output differs", file=stderr)
+                    failed = True
+        exit(1 if failed else 0)
+
+    if len(argv) >= 3 and argv[1] == "--batch":
+        # Serial unless asked: ninja already runs many img_batch edges at once
+        num_workers = 1
+        if "--jobs" in argv:
+            num_workers = int(argv[argv.index("--jobs") + 1])
+
+        run_batch(read_manifest(argv[2]), num_workers)
+        exit(0)
+
     if len(argv) < 4:
         print("usage: build.py MODE INFILE OUTFILE [--flip-x] [--flip-y]")
+        print("       build.py --batch MANIFEST [--jobs N]")
+        print("       build.py --check-vectorized PNG...")
         exit(1)
 
     mode = argv[1]
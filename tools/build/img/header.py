@@ -1,34 +1,50 @@
 #!/usr/bin/env python3
 
-from sys import argv
 import re
-import png  # type: ignore
+import sys
+from pathlib import Path
+from sys import argv
 
-if __name__ == "__main__":
-    infile, outfile = argv[1:3]
+sys.path.append(str(Path(__file__).parent.parent))
+from img.png_info import read_png_info
+
+
+def default_cname(infile):
+    cname = re.sub(r"[^0-9a-zA-Z_]", "_", infile)
+
+    if cname.startswith("ver_"):
+        cname = "_".join(cname.split("_")[2:])
 
-    if len(argv) > 3 and argv[3]:
-        cname = argv[3]
-    else:
-        cname = re.sub(r"[^0-9a-zA-Z_]", "_", infile)
+    if cname.startswith("src_"):
+        cname = cname[4:]
+    elif cname.startswith("assets_"):
+        cname = "_".join(cname.split("_")[2:])
 
-        if cname.startswith("ver_"):
-            cname = "_".join(cname.split("_")[2:])
+    return cname
 
-        if cname.startswith("src_"):
-            cname = cname[4:]
-        elif cname.startswith("assets_"):
-            cname = "_".join(cname.split("_")[2:])
 
-    img = png.Reader(infile)
-    width, height, rows, info = img.read()
+def header_source(infile, cname=""):
+    if not cname:
+        cname = default_cname(infile)
+
+    # Only the dimensions are needed, which IHDR has without decoding any pixels
+    info = read_png_info(infile)
+    width, height = info.width, info.height
+
+    return (
+        "// Generated file, do not edit.\n"
+        f"#ifndef _{cname.upper()}_\n"
+        f"#define _{cname.upper()}_\n"
+        f"\n"
+        f"#define {cname}_width {width}\n"
+        f"#define {cname}_height {height}\n"
+        f"\n"
+        f"#endif\n"
+    )
+
+
+if __name__ == "__main__":
+    infile, outfile = argv[1:3]
 
     with open(outfile, "w") as f:
-        f.write("// Generated file, do not edit.\n")
-        f.write(f"#ifndef _{cname.upper()}_\n")
-        f.write(f"#define _{cname.upper()}_\n")
-        f.write(f"\n")
-        f.write(f"#define {cname}_width {width}\n")
-        f.write(f"#define {cname}_height {height}\n")
-        f.write(f"\n")
-        f.write(f"#endif\n")
+        f.write(header_source(infile, argv[3] if len(argv) > 3 else ""))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+Decoded PNG pixels with a persistent cache, so an image read by several build steps is only inflated once.
+
+Entries are keyed by the file's path, mtime and size and hold the image's samples and palette in a small binary
+format. See file_cache.py for how entries are stored and evicted.
+
+Environment:
+    PM_PNG_CACHE_DIR      cache location (default: .cache/png in the repo root)
+    PM_PNG_CACHE_SIZE     size limit in MiB (default: 256), 0 disables the cache
+"""
+
+import hashlib
+import os
+import struct
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import png  # type: ignore
+
+sys.path.append(str(Path(__file__).parent.parent))
+from file_cache import FileCache
+
+ROOT_DIR = Path(__file__).parent.parent.parent.parent
+
+CACHE_DIR = Path(os.environ.get("PM_PNG_CACHE_DIR", ROOT_DIR / ".cache" / "png"))
+CACHE_SIZE = int(os.environ.get("PM_PNG_CACHE_SIZE", 256)) * 1024 * 1024
+
+CACHE = FileCache(CACHE_DIR, ".bin", CACHE_SIZE)
+
+# Bump when the entry layout or the meaning of its fields changes
+FORMAT_VERSION = 1
+
+# magic, width, height, bitdepth, planes, palette entries (0xFFFF: no palette)
+ENTRY_HEADER = struct.Struct(">4sIIBBH")
+ENTRY_MAGIC = b"PNGC"
+NO_PALETTE = 0xFFFF
+
+RGBA = Tuple[int, int, int, int]
+
+
+@dataclass
+class DecodedPng:
+    width: int
+    height: int
+    bitdepth: int
+    planes: int
+    # Every sample in row-major order, like png.Reader.read_flat(), so palette images have one index per pixel
+    raster: bytes
+    # As png.Reader.palette(alpha="force"), or None for images without a PLTE chunk
+    palette: Optional[List[RGBA]]
+
+    @property
+    def stride(self) -> int:
+        return self.width * self.planes
+
+    def rows(self):
+        return [self.raster[y * self.stride : (y + 1) * self.stride] for y in range(self.height)]
+
+
+def decode(path) -> DecodedPng:
+    img = png.Reader(filename=str(path))
+    width, height, raster, info = img.read_flat()
+    palette = list(img.palette(alpha="force")) if img.plte is not None else None
+
+    # 16-bit samples don't fit the byte-per-sample cache format, so they keep pypng's array
+    if info["bitdepth"] <= 8:
+        raster = bytes(raster)
+
+    return DecodedPng(width, height, info["bitdepth"], info["planes"], raster, palette)
+
+
+def cache_key(path) -> Optional[str]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{FORMAT_VERSION}:{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}".encode())
+    return h.hexdigest()
+
+
+def serialize(decoded: DecodedPng) -> bytes:
+    palette = decoded.palette
+    header = ENTRY_HEADER.pack(
+        ENTRY_MAGIC,
+        decoded.width,
+        decoded.height,
+        decoded.bitdepth,
+        decoded.planes,
+        NO_PALETTE if palette is None else len(palette),
+    )
+    palette_bytes = b"" if palette is None else bytes(c for rgba in palette for c in rgba)
+    return header + palette_bytes + decoded.raster
+
+
+def deserialize(data: bytes) -> Optional[DecodedPng]:
+    if len(data) < ENTRY_HEADER.size:
+        return None
+    magic, width, height, bitdepth, planes, palette_len = ENTRY_HEADER.unpack_from(data)
+    if magic != ENTRY_MAGIC:
+        return None
+
+    pos = ENTRY_HEADER.size
+    palette = None
+    if palette_len != NO_PALETTE:
+        palette = [tuple(data[i : i + 4]) for i in range(pos, pos + palette_len * 4, 4)]
+        pos += palette_len * 4
+
+    raster = data[pos:]
+    if len(raster) != width * height * planes:
+        return None
+
+    return DecodedPng(width, height, bitdepth, planes, raster, palette)  # type: ignore
+
+
+def read_png(path) -> DecodedPng:
+    """Decodes path, or returns its cached pixels if the file hasn't changed since they were stored"""
+    key = cache_key(path) if CACHE.enabled else None
+    if key is None:
+        return decode(path)
+
+    data = CACHE.load(key)
+    decoded = deserialize(data) if data is not None else None
+    if decoded is None:
+        decoded = decode(path)
+        if decoded.bitdepth <= 8:
+            CACHE.store(key, serialize(decoded))
+    return decoded
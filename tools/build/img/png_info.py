@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""
+Reads PNG metadata (dimensions and palette) straight from the chunks before IDAT, without decoding any pixel data.
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+RGBA = Tuple[int, int, int, int]
+
+
+@dataclass
+class PngInfo:
+    width: int
+    height: int
+    bitdepth: int
+    color_type: int
+    # PLTE entries with their tRNS alpha (0xFF where there is none), like png.Reader.palette(alpha="force")
+    palette: Optional[List[RGBA]] = None
+
+
+def read_png_info(path, read_palette: bool = False) -> PngInfo:
+    with open(path, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise ValueError(f"{path}: not a PNG file")
+
+        info = None
+        plte = None
+        trns = b""
+
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError(f"{path}: truncated PNG")
+            length, chunk_type = struct.unpack(">I4s", chunk_header)
+
+            if chunk_type == b"IDAT" or chunk_type == b"IEND":
+                break
+
+            data = f.read(length)
+            f.seek(4, 1)  # CRC
+
+            if chunk_type == b"IHDR":
+                width, height, bitdepth, color_type = struct.unpack_from(">IIBB", data)
+                info = PngInfo(width, height, bitdepth, color_type)
+                if not read_palette:
+                    return info
+            elif chunk_type == b"PLTE":
+                plte = data
+            elif chunk_type == b"tRNS":
+                trns = data
+
+    if info is None:
+        raise ValueError(f"{path}: missing IHDR chunk")
+
+    if plte is not None:
+        alpha = trns[: len(plte) // 3] + b"\xFF" * (len(plte) // 3 - len(trns))
+        info.palette = [(plte[i * 3], plte[i * 3 + 1], plte[i * 3 + 2], alpha[i]) for i in range(len(plte) // 3)]
+
+    return info
+
+
+def read_png_palette(path) -> List[RGBA]:
+    """Equivalent to png.Reader(path).palette(alpha="force") after reading the preamble"""
+    palette = read_png_info(path, read_palette=True).palette
+    if palette is None:
+        raise ValueError(f"{path}: missing PLTE chunk")
+    return palette
@@ -2,9 +2,15 @@
 
 from sys import argv
 from collections import OrderedDict
+import struct
 import re
 import msgpack
 import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from common import write_if_changed
 
 
 class Message:
@@ -16,6 +22,80 @@ class Message:
         self.header_file_index = header_file_index
 
 
+MAX_SECTION_SIZE = 0xFFF
+
+
+def allocate_ids(messages):
+    """Assign a section and index to every message that lacks one, returning the sections as index -> message dicts"""
+    sections = []
+    # Sections only ever grow, so the first one with room never moves backwards
+    open_section = 0
+
+    for message in messages:
+        if message.section is None:
+            # allocate a section
+            while open_section < len(sections) - 1 and len(sections[open_section]) >= MAX_SECTION_SIZE:
+                open_section += 1
+            message.section = open_section
+        section_idx = message.section
+        while len(sections) <= section_idx:
+            sections.append({})
+        section = sections[section_idx]
+
+        if message.index is None:
+            message.index = len(section)
+
+        if message.index in section:
+            print(f"warning: multiple messages allocated to id {section_idx:02X}:{message.index:03X}")
+
+            if section[message.index].name and message.name:
+                print(f"warning: message '{section[message.index].name}' and '{message.name}' conflict")
+
+        section[message.index] = message
+
+    return sections
+
+
+def build_bin(sections):
+    """Lay out the table of contents, then each section's messages, offset table and padding, in one buffer"""
+    sections = [[section[idx] for idx in sorted(section)] for section in sections]
+
+    size = (len(sections) + 1) * 4
+    for section in sections:
+        size += sum(len(message.bytes) for message in section) + (len(section) + 1) * 4
+        size += -size % 0x10
+
+    out = bytearray(size)
+    pos = (len(sections) + 1) * 4  # skip past table of contents
+
+    section_offsets = []
+    for section in sections:
+        message_offsets = []
+        for message in section:
+            message_offsets.append(pos)
+            out[pos : pos + len(message.bytes)] = message.bytes
+            pos += len(message.bytes)
+
+        section_offsets.append(pos)
+        struct.pack_into(f">{len(section) + 1}I", out, pos, *message_offsets, pos)
+        pos += (len(section) + 1) * 4
+        pos += -pos % 0x10  # padding
+
+    struct.pack_into(f">{len(sections)}I", out, 0, *section_offsets)
+    return bytes(out)
+
+
+def build_header(messages):
+    lines = [f"#ifndef _MESSAGE_IDS_H_\n" f"#define _MESSAGE_IDS_H_\n" "\n" '#include "messages.h"\n' "\n"]
+
+    for message in messages:
+        if message.name:
+            lines.append(f"#define MSG_{message.name} MESSAGE_ID(0x{message.section:02X}, 0x{message.index:03X})\n")
+
+    lines.append("\n#endif\n")
+    return "".join(lines)
+
+
 if __name__ == "__main__":
     if len(argv) < 3:
         print("usage: combine.py { [out.bin] [out.h] | --no-header [out.bin] } [compiled...]")
@@ -28,94 +108,14 @@ if __name__ == "__main__":
         _, outfile, header_file, *infiles = argv
 
     messages = []
-    # header_files = []
 
     for i, infile in enumerate(infiles):
-        # if infile == "--headers":
-        #     header_files = infiles[i+1:]
-        #     break
-
         with open(infile, "rb") as f:
             messages.extend(Message(msg, i) for msg in msgpack.unpack(f))
 
-    with open(outfile, "wb") as f:
-        # sectioned+indexed, followed by just sectioned, followed by just indexed, followed by named (unsectioned & unindexed)
-        # messages.sort(key=lambda msg: bool(msg.section)<<2 + bool(msg.index))
-
-        names = set()
-
-        sections = []
-        # messages_by_file = {}
-
-        for message in messages:
-            if message.section is None:
-                # allocate a section
-                for section_idx, section in enumerate(sections):
-                    if len(section) < 0xFFF:
-                        break
-                message.section = section_idx
-            else:
-                section_idx = message.section
-            while len(sections) <= section_idx:
-                sections.append({})
-            section = sections[section_idx]
-
-            if message.index is None:
-                message.index = len(section)
-
-            # if message.name:
-            #     if message.name in names:
-            #         print(f"error: multiple messages with name '{message.name}'")
-            #         exit(1)
-            #     else:
-            #         names.add(message.name)
-
-            # if message.header_file_index in messages_by_file:
-            #     messages_by_file[message.header_file_index].add(message)
-            # else:
-            #     messages_by_file[message.header_file_index] = set([message])
-
-            if message.index in section:
-                print(f"warning: multiple messages allocated to id {section_idx:02X}:{message.index:03X}")
-
-                if section[message.index].name and message.name:
-                    print(f"warning: message '{section[message.index].name}' and '{message.name}' conflict")
-
-            section[message.index] = message
-
-        f.seek((len(sections) + 1) * 4)  # skip past table of contents
-
-        section_offsets = []
-        for section in sections:
-            # convert dict into sorted list
-            section = [msg for idx, msg in sorted(section.items(), key=lambda ele: ele[0])]
-
-            message_offsets = []
-            for message in section:
-                message_offsets.append(f.tell())
-                f.write(message.bytes)
-
-            section_offset = f.tell()
-            section_offsets.append(section_offset)
-            for offset in message_offsets:
-                f.write(offset.to_bytes(4, byteorder="big"))
-            f.write(section_offset.to_bytes(4, byteorder="big"))
-
-            # padding
-            while f.tell() % 0x10 != 0:
-                f.write(b"\0\0\0\0")
-
-        f.seek(0)
-        for offset in section_offsets:
-            f.write(offset.to_bytes(4, byteorder="big"))
-        f.write(b"\0\0\0\0")
+    sections = allocate_ids(messages)
+    write_if_changed(outfile, build_bin(sections))
 
     if header_file is not None:
-        with open(header_file, "w") as f:
-            f.write(f"#ifndef _MESSAGE_IDS_H_\n" f"#define _MESSAGE_IDS_H_\n" "\n" '#include "messages.h"\n' "\n")
-
-            for message in messages:
-                if message.name:
-                    f.write(f"#define MSG_{message.name} MESSAGE_ID(0x{message.section:02X}, 0x{message.index:03X})\n")
-
-            f.write("\n#endif\n")
+        # Unchanged IDs leave the header untouched, so text-only edits don't rebuild every includer
+        write_if_changed(header_file, build_header(messages).encode("utf-8"))
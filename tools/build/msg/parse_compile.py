@@ -2,9 +2,17 @@
 
 from sys import argv
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import io
+import os
 import re
+import sys
+from pathlib import Path
 import msgpack  # way faster than pickle
 
+sys.path.append(str(Path(__file__).parent.parent))
+from common import write_if_changed
+
 
 class Message:
     def __init__(self, name, section, index):
@@ -12,7 +20,7 @@ class Message:
         self.section = section
         self.index = index
 
-        self.bytes = []  # XXX: bytearray would be better
+        self.bytes = bytearray()
 
 
 def try_convert_int(s):
@@ -22,19 +30,20 @@ def try_convert_int(s):
         return s
 
 
-def parse_command(source):
-    if source[0] != "[":
-        return None, [], {}, source
-    source = source[1:]  # "["
+def parse_command(source, pos):
+    """Parse a [command] starting at source[pos], returning the position just past it"""
+    if source[pos] != "[":
+        return None, [], {}, pos
 
-    inside_brackets = ""
-    while source[0] != "]":
-        if source[0] == "\n":
-            return None, [], {}, source
+    end = source.find("]", pos + 1)
+    newline = source.find("\n", pos + 1)
+    if newline != -1 and (end == -1 or newline < end):
+        return None, [], {}, newline
+    if end == -1:
+        raise IndexError("unterminated command")
 
-        inside_brackets += source[0]
-        source = source[1:]
-    source = source[1:]  # "]"
+    inside_brackets = source[pos + 1 : end]
+    pos = end + 1  # "]"
 
     command, *raw_args = inside_brackets.split(" ")
 
@@ -59,7 +68,7 @@ def parse_command(source):
     # for arg in raw_args:
     #     args.append(try_convert_int(arg.lower()))
 
-    return command.lower(), args, named_args, source
+    return command.lower(), args, named_args, pos
 
 
 def color_to_code(color, style):
@@ -3124,27 +3133,50 @@ CHARSET_IQUE = {
 }
 
 
-def check_if_correct_charset(char, cur_charset, filename, lineno):
-    warn_msg = f"{filename}:{lineno}: Warning: character '{char}' is present but is completely in a wrong charset currently set. Add {{}} before the character to silence this warning."
+JP_CHARSETS = [
+    (CHARSET_KANA, "[Charset Kana]"),
+    (CHARSET_LATIN, "[Charset Latin]"),
+    (CHARSET_KANJI, "[Charset Kanji]"),
+    (CHARSET_BUTTONS, "[Charset Buttons]"),
+]
+
+# key -> indices into JP_CHARSETS of every charset containing it, in priority order
+JP_CHARSET_INDEX = {}
+for i, (jp_charset, _) in enumerate(JP_CHARSETS):
+    for key in jp_charset:
+        JP_CHARSET_INDEX.setdefault(key, []).append(i)
+
+ENCODINGS = {}
+
+
+def get_encoding(charset):
+    """Returns charset with every value flattened to bytes, built once per charset"""
+    encoding = ENCODINGS.get(id(charset))
+    if encoding is None:
+        encoding = {key: bytes([data]) if type(data) is int else bytes(data) for key, data in charset.items()}
+        ENCODINGS[id(charset)] = encoding
+    return encoding
+
 
+def check_if_correct_charset(char, cur_charset, filename, lineno):
     if char == " " or char == "　":
         return -1, cur_charset
-    elif char in CHARSET_KANA and cur_charset is not CHARSET_KANA:
-        print(warn_msg.format("[Charset Kana]"))
-        return 0, CHARSET_KANA
-    elif char in CHARSET_LATIN and cur_charset is not CHARSET_LATIN:
-        print(warn_msg.format("[Charset Latin]"))
-        return 1, CHARSET_LATIN
-    elif char in CHARSET_KANJI and cur_charset is not CHARSET_KANJI:
-        print(warn_msg.format("[Charset Kanji]"))
-        return 2, CHARSET_KANJI
-    elif char in CHARSET_BUTTONS and cur_charset is not CHARSET_BUTTONS:
-        print(warn_msg.format("[Charset Buttons]"))
-        return 3, CHARSET_BUTTONS
+
+    for i in JP_CHARSET_INDEX.get(char, ()):
+        charset, label = JP_CHARSETS[i]
+        if cur_charset is not charset:
+            print(
+                f"{filename}:{lineno}: Warning: character '{char}' is present but is completely in a wrong charset currently set. Add {label} before the character to silence this warning."
+            )
+            return i, charset
 
     return -1, cur_charset
 
 
+# Plain text that can be encoded in one go: stops at commands, message ends, escapes and line breaks
+TEXT_RUN = re.compile(r"[^\[}\\\r\n\t]+")
+
+
 def strip_c_comments(text):
     def replacer(match):
         s = match.group(0)
@@ -3160,21 +3192,13 @@ def strip_c_comments(text):
     return re.sub(pattern, replacer, text)
 
 
-if __name__ == "__main__":
-    if len(argv) < 3:
-        print("usage: parse_compile.py [version] [in.msg] [out.msgpack] [--c]")
-        exit(1)
-
-    version = argv[1]
-    filename = argv[2]
-    outfile = argv[3]
-    is_output_format_c = "--c" in argv
-
+def compile_messages(version, filename, is_output_format_c):
     messages = []
 
     message = None
     with open(filename, "r") as f:
         source = strip_c_comments(f.read())
+        cursor = 0
         lineno = 1
 
         directive = ""
@@ -3194,33 +3218,29 @@ if __name__ == "__main__":
         explicit_end = False
         choiceindex = -1
 
-        while len(source) > 0:
-            if source[0] == "\r" or source[0] == "\t":
-                source = source[1:]
+        while cursor < len(source):
+            if source[cursor] == "\r" or source[cursor] == "\t":
+                cursor += 1
                 continue
 
-            if source[0] == "\n":
+            if source[cursor] == "\n":
                 lineno += 1
-                source = source[1:]
+                cursor += 1
 
                 for i in range(indent_level):
-                    if source[0] == "\t":
-                        source = source[1:]
+                    if source[cursor] == "\t":
+                        cursor += 1
                     else:
                         break
 
                 continue
 
             if message is None:
-                directive = ""
-                while source[0] != " ":
-                    if source[0] == "\n":
-                        lineno += 1
-                    elif source[0] == "\r":
-                        pass
-                    else:
-                        directive += source[0]
-                    source = source[1:]
+                end = source.index(" ", cursor)
+                directive = source[cursor:end]
+                lineno += directive.count("\n")
+                directive = directive.replace("\n", "").replace("\r", "")
+                cursor = end
 
                 directive = directive.split(":")
 
@@ -3261,56 +3281,56 @@ if __name__ == "__main__":
                 else:
                     charset = CHARSET_STANDARD
 
-                while source[0] != "{":
-                    source = source[1:]
+                while source[cursor] != "{":
+                    cursor += 1
 
-                    if source[0] == "\n":
+                    if source[cursor] == "\n":
                         lineno += 1
-                    elif source[0] == "\r":
+                    elif source[cursor] == "\r":
                         pass
-                    elif source[0] == "{":
+                    elif source[cursor] == "{":
                         break
-                    elif source[0] != " " and source[0] != "\t":
+                    elif source[cursor] != " " and source[cursor] != "\t":
                         print(f"{filename}:{lineno}: expected opening brace ('{{')")
                         exit(1)
 
-                source = source[1:]  # {
+                cursor += 1  # {
 
                 # count indent level
                 indent_level = 0
                 """
-                while source[0] == " " or source[0] == "\t" or source[0] == "\n" or source[0] == "\r":
-                    if source[0] == " " or source[0] == "\t":
+                while source[cursor] == " " or source[cursor] == "\t" or source[cursor] == "\n" or source[cursor] == "\r":
+                    if source[cursor] == " " or source[cursor] == "\t":
                         indent_level += 1
-                    source = source[1:]
+                    cursor += 1
                 """
             else:
-                command, args, named_args, source = parse_command(source)
+                command, args, named_args, cursor = parse_command(source, cursor)
 
                 if command:
                     if command == "end":
-                        message.bytes += [0xFD]
+                        message.bytes.append(0xFD)
                         explicit_end = True
                     elif command == "raw":
-                        message.bytes += [*args]
+                        message.bytes.extend([*args])
                     elif command == "br":
-                        message.bytes += [0xF0]
+                        message.bytes.append(0xF0)
                     elif command == "wait":
-                        message.bytes += [0xF1]
+                        message.bytes.append(0xF1)
                     elif command == "pause":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xF2, args[0]]
+                        message.bytes.extend([0xF2, args[0]])
                     elif command == "next":
-                        message.bytes += [0xFB]
+                        message.bytes.append(0xFB)
                     elif command == "yield":
-                        message.bytes += [0xFF, 0x04]
+                        message.bytes.extend([0xFF, 0x04])
                     elif command == "savecolor":
-                        message.bytes += [0xFF, 0x24]
+                        message.bytes.extend([0xFF, 0x24])
                     elif command == "restorecolor":
-                        message.bytes += [0xFF, 0x25]
+                        message.bytes.extend([0xFF, 0x25])
                     elif command == "color":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: color command requires 1 parameter")
@@ -3322,27 +3342,27 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: unknown color")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x05, color]
+                        message.bytes.extend([0xFF, 0x05, color])
                         # color_stack.append(color)
                     # elif command == "/color":
                     #    color_stack.pop()
-                    #    message.bytes += [0xFF, 0x05, color_stack[0]]
+                    #    message.bytes.extend([0xFF, 0x05, color_stack[0]])
                     elif command == "style":
-                        message.bytes += [0xFC]
+                        message.bytes.append(0xFC)
 
                         style = args[0]
                         args = args[1:]
                         if type(style) is int:
-                            message.bytes += [style, *args]
+                            message.bytes.extend([style, *args])
                         else:
                             if style == "right":
-                                message.bytes += [0x01]
+                                message.bytes.append(0x01)
                             elif style == "left":
-                                message.bytes += [0x02]
+                                message.bytes.append(0x02)
                             elif style == "center":
-                                message.bytes += [0x03]
+                                message.bytes.append(0x03)
                             elif style == "tattle":
-                                message.bytes += [0x04]
+                                message.bytes.append(0x04)
                             elif style == "choice":
                                 pos = named_args.get("pos")
 
@@ -3356,17 +3376,19 @@ if __name__ == "__main__":
                                     print(f"{filename}:{lineno}: 'choice' style requires size=_,_")
                                     exit(1)
 
-                                message.bytes += [
-                                    0x05,
-                                    pos[0],
-                                    pos[1],
-                                    size[0],
-                                    size[1],
-                                ]
+                                message.bytes.extend(
+                                    [
+                                        0x05,
+                                        pos[0],
+                                        pos[1],
+                                        size[0],
+                                        size[1],
+                                    ]
+                                )
                             elif style == "inspect":
-                                message.bytes += [0x06]
+                                message.bytes.append(0x06)
                             elif style == "sign":
-                                message.bytes += [0x07]
+                                message.bytes.append(0x07)
                             elif style == "lamppost":
                                 height = named_args.get("height")
 
@@ -3374,7 +3396,7 @@ if __name__ == "__main__":
                                     print(f"{filename}:{lineno}: 'lamppost' style requires height=_")
                                     exit(1)
 
-                                message.bytes += [0x08, height]
+                                message.bytes.extend([0x08, height])
                             elif style == "postcard":
                                 index = named_args.get("index")
 
@@ -3382,11 +3404,11 @@ if __name__ == "__main__":
                                     print(f"{filename}:{lineno}: 'postcard' style requires index=_")
                                     exit(1)
 
-                                message.bytes += [0x09, index]
+                                message.bytes.extend([0x09, index])
                             elif style == "popup":
-                                message.bytes += [0x0A]
+                                message.bytes.append(0x0A)
                             elif style == "popup2":
-                                message.bytes += [0x0B]
+                                message.bytes.append(0x0B)
                             elif style == "upgrade":
                                 pos = named_args.get("pos")
 
@@ -3400,17 +3422,19 @@ if __name__ == "__main__":
                                     print(f"{filename}:{lineno}: 'upgrade' style requires size=_,_")
                                     exit(1)
 
-                                message.bytes += [
-                                    0x0C,
-                                    pos[0],
-                                    pos[1],
-                                    size[0],
-                                    size[1],
-                                ]
+                                message.bytes.extend(
+                                    [
+                                        0x0C,
+                                        pos[0],
+                                        pos[1],
+                                        size[0],
+                                        size[1],
+                                    ]
+                                )
                             elif style == "narrate":
-                                message.bytes += [0x0D]
+                                message.bytes.append(0x0D)
                             elif style == "epilogue":
-                                message.bytes += [0x0E]
+                                message.bytes.append(0x0E)
                     elif command == "font":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: font command requires 1 parameter")
@@ -3433,7 +3457,7 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: unknown font '{font}'")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x00, font]
+                        message.bytes.extend([0xFF, 0x00, font])
                         # font_stack.append(font)
 
                         if font == 3 or font == 4:
@@ -3447,7 +3471,7 @@ if __name__ == "__main__":
                                 charset = CHARSET_STANDARD
                     # elif command == "/font":
                     #     font_stack.pop()
-                    #     message.bytes += [0xFF, 0x00, font_stack[0]]
+                    #     message.bytes.extend([0xFF, 0x00, font_stack[0]])
 
                     #     if font == 3 or font == 4:
                     #         charset = CHARSET_CREDITS
@@ -3477,7 +3501,7 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: unknown charset '{arg_charset}'")
                             exit(1)
 
-                        message.bytes += [0xF3 + arg_charset]
+                        message.bytes.append(0xF3 + arg_charset)
 
                         if arg_charset == 0:
                             charset = CHARSET_KANA
@@ -3489,28 +3513,28 @@ if __name__ == "__main__":
                             charset = CHARSET_BUTTONS
 
                     elif command == "variant0":
-                        message.bytes += [0xF3]
+                        message.bytes.append(0xF3)
 
                     elif command == "inputoff":
-                        message.bytes += [0xFF, 0x07]
+                        message.bytes.extend([0xFF, 0x07])
                     elif command == "inputon":
-                        message.bytes += [0xFF, 0x08]
+                        message.bytes.extend([0xFF, 0x08])
                     elif command == "delayoff":
-                        message.bytes += [0xFF, 0x09]
+                        message.bytes.extend([0xFF, 0x09])
                     elif command == "delayon":
-                        message.bytes += [0xFF, 0x0A]
+                        message.bytes.extend([0xFF, 0x0A])
                     elif command == "charwidth":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x0B, args[0]]
+                        message.bytes.extend([0xFF, 0x0B, args[0]])
                     elif command == "scroll":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x0C, args[0]]
+                        message.bytes.extend([0xFF, 0x0C, args[0]])
                     elif command == "size":
                         args = args[0]
 
@@ -3521,9 +3545,9 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires 2 parameters")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x0D, args[0], args[1]]
+                        message.bytes.extend([0xFF, 0x0D, args[0], args[1]])
                     elif command == "sizereset":
-                        message.bytes += [0xFF, 0x0E]
+                        message.bytes.extend([0xFF, 0x0E])
                     elif command == "speed":
                         delay = named_args.get("delay")
 
@@ -3537,73 +3561,73 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires chars=_")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x0F, delay, chars]
+                        message.bytes.extend([0xFF, 0x0F, delay, chars])
                     # elif command == "pos":
                     #     if "y" not in named_args:
                     #         print(f"{filename}:{lineno}: pos command requires parameter: y (x is optional)")
                     #         exit(1)
 
                     #     if "x" in named_args:
-                    #         message.bytes += [0xFF, 0x10, named_args["x"], named_args["y"]]
+                    #         message.bytes.extend([0xFF, 0x10, named_args["x"], named_args["y"]])
                     #     else:
-                    #         message.bytes += [0xFF, 0x11, named_args["y"]]
+                    #         message.bytes.extend([0xFF, 0x11, named_args["y"]])
                     elif command == "setposx":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x10, args[0] >> 8, args[0] & 0xFF]
+                        message.bytes.extend([0xFF, 0x10, args[0] >> 8, args[0] & 0xFF])
                     elif command == "setposy":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x11, *args]
+                        message.bytes.extend([0xFF, 0x11, *args])
                     elif command == "right":
                         if len(args) == 0:
                             if version == "jp":
                                 charset_byte, charset = check_if_correct_charset("[right]", charset, filename, lineno)
                                 if charset_byte != -1:
-                                    message.bytes += [0xF3 + charset_byte]
-                                message.bytes += [0xB4]
+                                    message.bytes.append(0xF3 + charset_byte)
+                                message.bytes.append(0xB4)
                             else:
-                                message.bytes += [0x95]
+                                message.bytes.append(0x95)
                         else:
                             if len(args) != 1:
                                 print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                                 exit(1)
 
-                            message.bytes += [0xFF, 0x12, args[0]]
+                            message.bytes.extend([0xFF, 0x12, args[0]])
                     elif command == "down":
                         if len(args) == 0:
                             if version == "jp":
                                 charset_byte, charset = check_if_correct_charset("[down]", charset, filename, lineno)
                                 if charset_byte != -1:
-                                    message.bytes += [0xF3 + charset_byte]
-                                message.bytes += [0xB2]
+                                    message.bytes.append(0xF3 + charset_byte)
+                                message.bytes.append(0xB2)
                             else:
-                                message.bytes += [0x93]
+                                message.bytes.append(0x93)
                         else:
                             if len(args) != 1:
                                 print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                                 exit(1)
 
-                            message.bytes += [0xFF, 0x13, args[0]]
+                            message.bytes.extend([0xFF, 0x13, args[0]])
                     elif command == "up":
                         if len(args) == 0:
                             if version == "jp":
                                 charset_byte, charset = check_if_correct_charset("[up]", charset, filename, lineno)
                                 if charset_byte != -1:
-                                    message.bytes += [0xF3 + charset_byte]
-                                message.bytes += [0xB1]
+                                    message.bytes.append(0xF3 + charset_byte)
+                                message.bytes.append(0xB1)
                             else:
-                                message.bytes += [0x92]
+                                message.bytes.append(0x92)
                         else:
                             if len(args) != 1:
                                 print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                                 exit(1)
 
-                            message.bytes += [0xFF, 0x14, args[0]]
+                            message.bytes.extend([0xFF, 0x14, args[0]])
                     elif command == "inlineimage":
                         index = named_args.get("index")
 
@@ -3611,7 +3635,7 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires index=_")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x15, index]
+                        message.bytes.extend([0xFF, 0x15, index])
                     elif command == "animsprite":
                         spriteid = named_args.get("spriteid")
                         raster = named_args.get("raster")
@@ -3625,13 +3649,15 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires raster=_")
                             exit(1)
 
-                        message.bytes += [
-                            0xFF,
-                            0x16,
-                            spriteid >> 8,
-                            spriteid & 0xFF,
-                            raster,
-                        ]
+                        message.bytes.extend(
+                            [
+                                0xFF,
+                                0x16,
+                                spriteid >> 8,
+                                spriteid & 0xFF,
+                                raster,
+                            ]
+                        )
                     elif command == "itemicon":
                         itemid = named_args.get("itemid")
 
@@ -3641,7 +3667,7 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires itemid=_")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x17, itemid >> 8, itemid & 0xFF]
+                        message.bytes.extend([0xFF, 0x17, itemid >> 8, itemid & 0xFF])
                     elif command == "image":
                         index = named_args.get("index")
                         pos = named_args.get("pos")  # xx,y
@@ -3665,17 +3691,19 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires fadeamount=_")
                             exit(1)
 
-                        message.bytes += [
-                            0xFF,
-                            0x18,
-                            index,
-                            pos[0] >> 8,
-                            pos[0] & 0xFF,
-                            pos[1],
-                            hasborder,
-                            alpha,
-                            fadeamount,
-                        ]
+                        message.bytes.extend(
+                            [
+                                0xFF,
+                                0x18,
+                                index,
+                                pos[0] >> 8,
+                                pos[0] & 0xFF,
+                                pos[1],
+                                hasborder,
+                                alpha,
+                                fadeamount,
+                            ]
+                        )
                     elif command == "hideimage":
                         fadeamount = named_args.get("fadeamount", 0)
 
@@ -3683,7 +3711,7 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires fadeamount=_")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x19, fadeamount]
+                        message.bytes.extend([0xFF, 0x19, fadeamount])
                     elif command == "animdelay":
                         index = named_args.get("index")
                         delay = named_args.get("delay")
@@ -3695,17 +3723,17 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires delay=_")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x1A, 0, index, delay]
+                        message.bytes.extend([0xFF, 0x1A, 0, index, delay])
                     elif command == "animloop":
                         if len(args) != 2:
                             print(f"{filename}:{lineno}: {command} command requires 2 parameters")
                             exit(1)
-                        message.bytes += [0xFF, 0x1B, args[0], args[1]]
+                        message.bytes.extend([0xFF, 0x1B, args[0], args[1]])
                     elif command == "animdone":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
-                        message.bytes += [0xFF, 0x1C, args[0]]
+                        message.bytes.extend([0xFF, 0x1C, args[0]])
                     elif command == "setcursorpos":
                         index = named_args.get("index")
                         pos = named_args.get("pos")
@@ -3717,65 +3745,65 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires pos=_,_")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x1D, index, pos, pos]
+                        message.bytes.extend([0xFF, 0x1D, index, pos, pos])
                     elif command == "cursor":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: cursor command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x1E, *args]
+                        message.bytes.extend([0xFF, 0x1E, *args])
                     elif command == "option" and choiceindex == -1:
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: option command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x21, *args]
+                        message.bytes.extend([0xFF, 0x21, *args])
                     elif command == "endchoice" and choiceindex == -1:
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x1F, args[0]]
+                        message.bytes.extend([0xFF, 0x1F, args[0]])
                     elif command == "setcancel":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x20, args[0]]
+                        message.bytes.extend([0xFF, 0x20, args[0]])
                     # elif command == "startfx":
-                    #     message.bytes += [0xFF, 0x26, resolve_effect(args[0]), *args[1:]]
+                    #     message.bytes.extend([0xFF, 0x26, resolve_effect(args[0]), *args[1:]])
                     # elif command == "endfx":
-                    #     message.bytes += [0xFF, 0x27, resolve_effect(args[0]), *args[1:]]
+                    #     message.bytes.extend([0xFF, 0x27, resolve_effect(args[0]), *args[1:]])
                     elif command == "/fx":
-                        message.bytes += [0xFF, 0x27, fx_stack.pop()]
+                        message.bytes.extend([0xFF, 0x27, fx_stack.pop()])
                     elif command == "shake":
                         fx_stack.append(0x00)
-                        message.bytes += [0xFF, 0x26, 0x00]
+                        message.bytes.extend([0xFF, 0x26, 0x00])
                     elif command == "/shake":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x00]
+                        message.bytes.extend([0xFF, 0x27, 0x00])
                     elif command == "wave":
                         fx_stack.append(0x01)
-                        message.bytes += [0xFF, 0x26, 0x01]
+                        message.bytes.extend([0xFF, 0x26, 0x01])
                     elif command == "/wave":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x01]
+                        message.bytes.extend([0xFF, 0x27, 0x01])
                     elif command == "noiseoutline":
                         fx_stack.append(0x02)
-                        message.bytes += [0xFF, 0x26, 0x02]
+                        message.bytes.extend([0xFF, 0x26, 0x02])
                     elif command == "/noiseoutline":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x02]
+                        message.bytes.extend([0xFF, 0x27, 0x02])
                     elif command == "static":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
                         fx_stack.append(0x03)
-                        message.bytes += [0xFF, 0x26, 0x03, args[0]]
+                        message.bytes.extend([0xFF, 0x26, 0x03, args[0]])
                     elif command == "/static":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x03]
+                        message.bytes.extend([0xFF, 0x27, 0x03])
                     elif command == "blur":
                         _dir = named_args.get("dir")
 
@@ -3791,72 +3819,72 @@ if __name__ == "__main__":
                             exit(1)
 
                         fx_stack.append(0x05)
-                        message.bytes += [0xFF, 0x26, 0x05, _dir]
+                        message.bytes.extend([0xFF, 0x26, 0x05, _dir])
                     elif command == "/blur":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x05]
+                        message.bytes.extend([0xFF, 0x27, 0x05])
                     elif command == "rainbow":
                         fx_stack.append(0x06)
-                        message.bytes += [0xFF, 0x26, 0x06]
+                        message.bytes.extend([0xFF, 0x26, 0x06])
                     elif command == "/rainbow":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x06]
+                        message.bytes.extend([0xFF, 0x27, 0x06])
                     elif command == "ditherfade":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
                         fx_stack.append(0x07)
-                        message.bytes += [0xFF, 0x26, 0x07, args[0]]
+                        message.bytes.extend([0xFF, 0x26, 0x07, args[0]])
                     elif command == "/ditherfade":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x07]
+                        message.bytes.extend([0xFF, 0x27, 0x07])
                     elif command == "printrising":
                         fx_stack.append(0x0A)
-                        message.bytes += [0xFF, 0x26, 0x0A]
+                        message.bytes.extend([0xFF, 0x26, 0x0A])
                     elif command == "/printrising":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x0A]
+                        message.bytes.extend([0xFF, 0x27, 0x0A])
                     elif command == "printgrowing":
                         fx_stack.append(0x0B)
-                        message.bytes += [0xFF, 0x26, 0x0B]
+                        message.bytes.extend([0xFF, 0x26, 0x0B])
                     elif command == "/printgrowing":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x0B]
+                        message.bytes.extend([0xFF, 0x27, 0x0B])
                     elif command == "sizejitter":
                         fx_stack.append(0x0C)
-                        message.bytes += [0xFF, 0x26, 0x0C]
+                        message.bytes.extend([0xFF, 0x26, 0x0C])
                     elif command == "/sizejitter":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x0C]
+                        message.bytes.extend([0xFF, 0x27, 0x0C])
                     elif command == "sizewave":
                         fx_stack.append(0x0D)
-                        message.bytes += [0xFF, 0x26, 0x0D]
+                        message.bytes.extend([0xFF, 0x26, 0x0D])
                     elif command == "/sizewave":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x0D]
+                        message.bytes.extend([0xFF, 0x27, 0x0D])
                     elif command == "dropshadow":
                         fx_stack.append(0x0E)
-                        message.bytes += [0xFF, 0x26, 0x0E]
+                        message.bytes.extend([0xFF, 0x26, 0x0E])
                     elif command == "/dropshadow":
                         fx_stack.pop()
-                        message.bytes += [0xFF, 0x27, 0x0E]
+                        message.bytes.extend([0xFF, 0x27, 0x0E])
                     elif command == "var":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: var command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x28, *args]
+                        message.bytes.extend([0xFF, 0x28, *args])
                     elif command == "centerx":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x29, *args]
+                        message.bytes.extend([0xFF, 0x29, *args])
                     elif command == "rewindoff":
-                        message.bytes += [0xFF, 0x2A, 0]
+                        message.bytes.extend([0xFF, 0x2A, 0])
                     elif command == "rewindon":
-                        message.bytes += [0xFF, 0x2A, 1]
+                        message.bytes.extend([0xFF, 0x2A, 1])
                     elif command == "customvoice":
                         soundids = named_args.get("soundids")
 
@@ -3864,24 +3892,26 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: {command} command requires soundids=_,_")
                             exit(1)
 
-                        message.bytes += [
-                            0xFF,
-                            0x2C,
-                            soundids[0] >> 24,
-                            (soundids[0] >> 16) & 0xFF,
-                            (soundids[0] >> 8) & 0xFF,
-                            soundids[0] & 0xFF,
-                            soundids[1] >> 24,
-                            (soundids[1] >> 16) & 0xFF,
-                            (soundids[1] >> 8) & 0xFF,
-                            soundids[1] & 0xFF,
-                        ]
+                        message.bytes.extend(
+                            [
+                                0xFF,
+                                0x2C,
+                                soundids[0] >> 24,
+                                (soundids[0] >> 16) & 0xFF,
+                                (soundids[0] >> 8) & 0xFF,
+                                soundids[0] & 0xFF,
+                                soundids[1] >> 24,
+                                (soundids[1] >> 16) & 0xFF,
+                                (soundids[1] >> 8) & 0xFF,
+                                soundids[1] & 0xFF,
+                            ]
+                        )
                     elif command == "volume":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x2E, *args]
+                        message.bytes.extend([0xFF, 0x2E, *args])
                     elif command == "voice":
                         if len(args) != 1:
                             print(f"{filename}:{lineno}: {command} command requires 1 parameter")
@@ -3900,37 +3930,41 @@ if __name__ == "__main__":
                             print(f"{filename}:{lineno}: unknown voice '{sound}'")
                             exit(1)
 
-                        message.bytes += [0xFF, 0x2F, sound]
+                        message.bytes.extend([0xFF, 0x2F, sound])
                         # sound_stack.append(sound)
                     # elif command == "/sound":
                     #     sound_stack.pop()
-                    #     message.bytes += [0xFF, 0x2F, sound_stack[0]]
+                    #     message.bytes.extend([0xFF, 0x2F, sound_stack[0]])
                     elif command == "a":
                         color_code = color_to_code("blue", "button")
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x00,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x00,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0x98,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0x98,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "b":
                         color_code = color_to_code(
                             named_args.get("color", "green"),
@@ -3938,28 +3972,32 @@ if __name__ == "__main__":
                         )
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x01,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x01,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0x99,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0x99,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "l":
                         color_code = color_to_code(
                             named_args.get("color", "gray"),
@@ -3967,28 +4005,32 @@ if __name__ == "__main__":
                         )
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x08,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x08,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0x9A,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0x9A,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "r":
                         color_code = color_to_code(
                             named_args.get("color", "gray"),
@@ -3996,54 +4038,62 @@ if __name__ == "__main__":
                         )
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x09,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x09,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0x9B,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0x9B,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "z":
                         color_code = color_to_code("grey", "button")
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x07,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x07,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0x9C,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0x9C,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "c-up":
                         color_code = color_to_code(
                             named_args.get("color", "yellow"),
@@ -4051,28 +4101,32 @@ if __name__ == "__main__":
                         )
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x03,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x03,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0x9D,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0x9D,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "c-down":
                         color_code = color_to_code(
                             named_args.get("color", "yellow"),
@@ -4080,28 +4134,32 @@ if __name__ == "__main__":
                         )
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x04,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x04,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0x9E,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0x9E,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "c-left":
                         color_code = color_to_code(
                             named_args.get("color", "yellow"),
@@ -4109,28 +4167,32 @@ if __name__ == "__main__":
                         )
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x05,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x05,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0x9F,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0x9F,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "c-right":
                         color_code = color_to_code(
                             named_args.get("color", "yellow"),
@@ -4138,28 +4200,32 @@ if __name__ == "__main__":
                         )
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x06,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x06,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xA0,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xA0,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "start":
                         color_code = color_to_code(
                             named_args.get("color", "red"),
@@ -4167,156 +4233,160 @@ if __name__ == "__main__":
                         )  #
                         assert color_code is not None
                         if version == "jp":
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xF6,
-                                0x02,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xF6,
+                                    0x02,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                         else:
-                            message.bytes += [
-                                0xFF,
-                                0x24,
-                                0xFF,
-                                0x05,
-                                color_code,
-                                0xA1,
-                                0xFF,
-                                0x25,
-                            ]
+                            message.bytes.extend(
+                                [
+                                    0xFF,
+                                    0x24,
+                                    0xFF,
+                                    0x05,
+                                    color_code,
+                                    0xA1,
+                                    0xFF,
+                                    0x25,
+                                ]
+                            )
                     elif command == "~a":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~a]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x00]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x00)
                         else:
-                            message.bytes += [0x98]
+                            message.bytes.append(0x98)
                     elif command == "~b":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~b]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x01]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x01)
                         else:
-                            message.bytes += [0x99]
+                            message.bytes.append(0x99)
                     elif command == "~l":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~l]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x08]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x08)
                         else:
-                            message.bytes += [0x9A]
+                            message.bytes.append(0x9A)
                     elif command == "~r":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~r]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x09]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x09)
                         else:
-                            message.bytes += [0x9B]
+                            message.bytes.append(0x9B)
                     elif command == "~z":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~z]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x07]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x07)
                         else:
-                            message.bytes += [0x9C]
+                            message.bytes.append(0x9C)
                     elif command == "~c-up":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~c-up]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x03]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x03)
                         else:
-                            message.bytes += [0x9D]
+                            message.bytes.append(0x9D)
                     elif command == "~c-down":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~c-down]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x04]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x04)
                         else:
-                            message.bytes += [0x9E]
+                            message.bytes.append(0x9E)
                     elif command == "~c-left":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~c-left]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x05]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x05)
                         else:
-                            message.bytes += [0x9F]
+                            message.bytes.append(0x9F)
                     elif command == "~c-right":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~c-right]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x06]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x06)
                         else:
-                            message.bytes += [0xA0]
+                            message.bytes.append(0xA0)
                     elif command == "~start":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[~start]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x02]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x02)
                         else:
-                            message.bytes += [0xA1]
+                            message.bytes.append(0xA1)
                     elif command == "note":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[note]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x6A]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x6A)
                         else:
-                            message.bytes += [0x00]
+                            message.bytes.append(0x00)
                     elif command == "heart":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[heart]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0xBD]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0xBD)
                         else:
-                            message.bytes += [0x90]
+                            message.bytes.append(0x90)
                     elif command == "star":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[star]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0xBE]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0xBE)
                         else:
-                            message.bytes += [0x91]
+                            message.bytes.append(0x91)
                     elif command == "left":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[left]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0xB3]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0xB3)
                         else:
-                            message.bytes += [0x94]
+                            message.bytes.append(0x94)
                     elif command == "circle":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[circle]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x61]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x61)
                         else:
-                            message.bytes += [0x96]
+                            message.bytes.append(0x96)
                     elif command == "cross":
                         if version == "jp":
                             charset_byte, charset = check_if_correct_charset("[cross]", charset, filename, lineno)
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0x62]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0x62)
                         else:
-                            message.bytes += [0x97]
+                            message.bytes.append(0x97)
                     elif command == "katakana":
                         if version != "jp":
                             print(f"{filename}:{lineno}: Command katakana is only supported in the JP version")
@@ -4329,8 +4399,8 @@ if __name__ == "__main__":
                                 "[katakana smalln]", charset, filename, lineno
                             )
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0xC5]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0xC5)
                         else:
                             print(f"{filename}:{lineno}: Invalid or unimplemented katakana character name {kana_char}")
                             exit(1)
@@ -4346,38 +4416,38 @@ if __name__ == "__main__":
                                 "[hiragana smalln]", charset, filename, lineno
                             )
                             if charset_byte != -1:
-                                message.bytes += [0xF3 + charset_byte]
-                            message.bytes += [0xC4]
+                                message.bytes.append(0xF3 + charset_byte)
+                            message.bytes.append(0xC4)
                         else:
                             print(f"{filename}:{lineno}: Invalid or unimplemented hiragana character name {kana_char}")
                             exit(1)
                     elif command == "fullspace":
-                        message.bytes += [0xF8]
+                        message.bytes.append(0xF8)
                     elif command == "halfspace":
-                        message.bytes += [0xF9]
+                        message.bytes.append(0xF9)
                     elif command == "savepos":
-                        message.bytes += [0xFF, 0x22]
+                        message.bytes.extend([0xFF, 0x22])
                     elif command == "restorepos":
-                        message.bytes += [0xFF, 0x23]
+                        message.bytes.extend([0xFF, 0x23])
                     elif command == "enablecdownnext":
-                        message.bytes += [0xFF, 0x2B]
+                        message.bytes.extend([0xFF, 0x2B])
                     elif command == "beginchoice":
                         choiceindex = 0
-                        message.bytes += [0xFF, 0x09]  # delayoff
+                        message.bytes.extend([0xFF, 0x09])  # delayoff
                     elif command == "option" and choiceindex >= 0:
-                        message.bytes += [0xFF, 0x1E, choiceindex]  # cursor n
-                        message.bytes += [0xFF, 0x21, choiceindex]  # option n
+                        message.bytes.extend([0xFF, 0x1E, choiceindex])  # cursor n
+                        message.bytes.extend([0xFF, 0x21, choiceindex])  # option n
                         choiceindex += 1
                     elif command == "endchoice" and choiceindex >= 0:
                         cancel = named_args.get("cancel")
 
-                        message.bytes += [0xFF, 0x21, 255]  # option 255
-                        message.bytes += [0xFF, 0x0A]  # delayon
+                        message.bytes.extend([0xFF, 0x21, 255])  # option 255
+                        message.bytes.extend([0xFF, 0x0A])  # delayon
 
                         if isinstance(cancel, int):
-                            message.bytes += [0xFF, 0x20, cancel]  # setcancel n
+                            message.bytes.extend([0xFF, 0x20, cancel])  # setcancel n
 
-                        message.bytes += [0xFF, 0x1F, choiceindex]  # endchoice n
+                        message.bytes.extend([0xFF, 0x1F, choiceindex])  # endchoice n
 
                         choiceindex = -1
                     elif command == "animation" and choiceindex >= 0:
@@ -4388,90 +4458,199 @@ if __name__ == "__main__":
                         print(f"{filename}:{lineno}: unknown command '{command}'")
                         exit(1)
                 else:
-                    if source[0] == "}":
+                    if source[cursor] == "}":
                         if not explicit_end:
                             print(f"{filename}:{lineno}: warning: string lacks an [end] command")
-                            # message.bytes += [0xFD]
+                            # message.bytes.append(0xFD)
                         explicit_end = False
 
-                        # sanity check
-                        for b in message.bytes:
-                            if not isinstance(b, int):
-                                print(b)
-
                         # padding
-                        while len(message.bytes) % 4 != 0:
-                            message.bytes += [0x00]
+                        message.bytes += bytes(-len(message.bytes) % 4)
 
                         message = None
-                        source = source[1:]  # }
+                        cursor += 1  # }
                         indent_level = 0
                         choiceindex = -1
                         continue
 
-                    if source[0] == "\\":
-                        source = source[1:]
+                    if source[cursor] == "\\":
+                        cursor += 1
+                        run = source[cursor]
+                    else:
+                        match = TEXT_RUN.match(source, cursor)
+                        run = match.group() if match else source[cursor]
 
                     if version == "jp" and charset is not CHARSET_CREDITS:
-                        charset_byte, charset = check_if_correct_charset(source[0], charset, filename, lineno)
-                        if charset_byte != -1:
-                            message.bytes += [0xF3 + charset_byte]
-                        elif (
-                            source[0] not in CHARSET_KANA
-                            and source[0] not in CHARSET_LATIN
-                            and source[0] not in CHARSET_KANJI
-                            and source[0] not in CHARSET_BUTTONS
-                        ):
-                            print(f"{filename}:{lineno}: unsupported character '{source[0]}' for current font")
-                            exit(1)
-
-                        data = charset[source[0]]
-
-                        if type(data) is int:
-                            message.bytes.append(data)
-                        else:
-                            message.bytes += data
+                        for char in run:
+                            charset_byte, charset = check_if_correct_charset(char, charset, filename, lineno)
+                            if charset_byte != -1:
+                                message.bytes.append(0xF3 + charset_byte)
+                            elif char not in JP_CHARSET_INDEX:
+                                print(f"{filename}:{lineno}: unsupported character '{char}' for current font")
+                                exit(1)
 
-                        source = source[1:]
+                            message.bytes += get_encoding(charset)[char]
                     else:
-                        if source[0] in charset:
-                            data = charset[source[0]]
-
-                            if type(data) is int:
-                                message.bytes.append(data)
-                            else:
-                                message.bytes += data
-
-                            source = source[1:]
-                        else:
-                            print(f"{filename}:{lineno}: unsupported character '{source[0]}' for current font")
+                        encoding = get_encoding(charset)
+                        try:
+                            message.bytes += b"".join([encoding[char] for char in run])
+                        except KeyError as e:
+                            print(f"{filename}:{lineno}: unsupported character '{e.args[0]}' for current font")
                             exit(1)
 
+                    cursor += len(run)
+
         if message != None:
             print(f"{filename}: missing [end]")
             exit(1)
 
+    return messages
+
+
+# "0xAB," for every byte value, so a message's array body is a single join
+C_HEX_BYTES = [f"0x{b:02X}," for b in range(256)]
+
+
+def serialize_messages(messages, is_output_format_c):
     if is_output_format_c:
-        with open(outfile, "w") as f:
-            f.write(f"#include <ultra64.h>\n")
+        f = io.StringIO()
+        f.write(f"#include <ultra64.h>\n")
 
-            for message in messages:
-                f.write(f"static s8 {message.name}[] = {{\n")
-                for b in message.bytes:
-                    f.write(f"0x{b:02X},")
-                f.write(f"\n}};\n")
+        for message in messages:
+            body = "".join(map(C_HEX_BYTES.__getitem__, message.bytes))
+            f.write(f"static s8 {message.name}[] = {{\n{body}\n}};\n")
 
+        return f.getvalue().encode("utf-8")
     else:
-        with open(outfile, "wb") as f:
-            msgpack.pack(
-                [
-                    {
-                        "section": message.section,
-                        "index": message.index,
-                        "name": message.name,
-                        "bytes": bytes(message.bytes),
-                    }
-                    for message in messages
-                ],
-                f,
-            )
+        return msgpack.packb(
+            [
+                {
+                    "section": message.section,
+                    "index": message.index,
+                    "name": message.name,
+                    "bytes": bytes(message.bytes),
+                }
+                for message in messages
+            ]
+        )
+
+
+def serialize_messages_incbin(messages, blob_path):
+    """Returns C source whose arrays .incbin their bytes from blob_path, and the blob itself"""
+    blob = bytearray()
+    f = io.StringIO()
+    f.write(f"#include <ultra64.h>\n")
+    f.write(f'#include "include_asset.h"\n')
+
+    blob_path = blob_path.replace("\\", "/")
+    for message in messages:
+        f.write(
+            f"extern s8 {message.name}[];\n"
+            f"__asm__(\n"
+            f'    PUSHSECTION(".data")\n'
+            f'    ".balign 4\\n"\n'
+            f'    ".type {message.name}, @object\\n"\n'
+            f'    "{message.name}:\\n"\n'
+            f'    ".incbin \\"{blob_path}\\", 0x{len(blob):X}, 0x{len(message.bytes):X}\\n"\n'
+            f"    POPSECTION\n"
+            f");\n"
+        )
+        blob += bytes(message.bytes)
+
+    return f.getvalue().encode("utf-8"), bytes(blob)
+
+
+def compile_file(version, infile, outfile, is_output_format_c, is_incbin=False):
+    messages = compile_messages(version, infile, is_output_format_c)
+
+    if is_incbin:
+        blob_path = os.path.splitext(outfile)[0] + ".bin"
+        source, blob = serialize_messages_incbin(messages, blob_path)
+        changed = write_if_changed(blob_path, blob)
+        return write_if_changed(outfile, source) or changed
+
+    return write_if_changed(outfile, serialize_messages(messages, is_output_format_c))
+
+
+def is_up_to_date(infile, outfile, is_incbin=False):
+    """Whether outfile is newer than both infile and this script"""
+    outputs = [outfile]
+    if is_incbin:
+        outputs.append(os.path.splitext(outfile)[0] + ".bin")
+
+    try:
+        out_mtime = min(os.stat(path).st_mtime_ns for path in outputs)
+    except FileNotFoundError:
+        return False
+    return out_mtime >= os.stat(infile).st_mtime_ns and out_mtime >= os.stat(__file__).st_mtime_ns
+
+
+def compile_batch(version, infiles, outfiles, is_output_format_c, jobs=None, is_incbin=False):
+    # A version's sections share one ninja edge, which reruns whenever any of them changes, so only recompile
+    # the sections whose outputs are stale
+    stale = [
+        (infile, outfile) for infile, outfile in zip(infiles, outfiles) if not is_up_to_date(infile, outfile, is_incbin)
+    ]
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(stale))
+
+    if jobs <= 1:
+        for infile, outfile in stale:
+            compile_file(version, infile, outfile, is_output_format_c, is_incbin)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(compile_file, version, infile, outfile, is_output_format_c, is_incbin)
+            for infile, outfile in stale
+        ]
+        for future in futures:
+            future.result()
+
+
+if __name__ == "__main__":
+    usage = (
+        "usage: parse_compile.py [version] [in.msg] [out.msgpack] [--c | --incbin]\n"
+        "       parse_compile.py [version] --batch [in.msg...] --out [out.msgpack...] [--c | --incbin] [--jobs N]\n"
+        "\n"
+        "--incbin writes C that .incbin's the message bytes from a .bin next to each output\n"
+        "--batch skips sections whose output is newer than their source; --jobs N caps its worker processes\n"
+        "(default: one per CPU)"
+    )
+
+    if len(argv) < 3:
+        print(usage)
+        exit(1)
+
+    version = argv[1]
+    args = argv[2:]
+    is_incbin = "--incbin" in args
+    is_output_format_c = "--c" in args or is_incbin
+    args = [arg for arg in args if arg != "--c" and arg != "--incbin"]
+
+    # Each version has a single msg edge, so by default a batch uses a worker per CPU (capped at the stale sections)
+    jobs = None
+    if "--jobs" in args:
+        i = args.index("--jobs")
+        jobs = int(args[i + 1])
+        del args[i : i + 2]
+
+    if args[0] == "--batch":
+        if "--out" not in args:
+            print(usage)
+            exit(1)
+
+        i = args.index("--out")
+        infiles = args[1:i]
+        outfiles = args[i + 1 :]
+
+        if len(infiles) != len(outfiles):
+            print(f"parse_compile.py: {len(infiles)} inputs but {len(outfiles)} outputs")
+            exit(1)
+
+        compile_batch(version, infiles, outfiles, is_output_format_c, jobs, is_incbin)
+    else:
+        filename, outfile = args[0], args[1]
+        compile_file(version, filename, outfile, is_output_format_c, is_incbin)
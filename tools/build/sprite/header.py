@@ -5,7 +5,7 @@ from pathlib import Path
 
 path.append(str(Path(__file__).parent.parent))
 
-from sprite.npc_sprite import from_dir as npc_from_dir
+from sprite.npc_sprite import names_from_dir
 
 if __name__ == "__main__":
     if len(argv) < 4:
@@ -21,7 +21,7 @@ if __name__ == "__main__":
         s = int(s_in)
         assert s >= 1
 
-        sprite = npc_from_dir(sprite_name, asset_stack, load_images=False)
+        sprite = names_from_dir(sprite_name, asset_stack)
 
         f.write(f"#ifndef _NPC_SPRITE_{sprite_name.upper()}_H_\n")
         f.write(f"#define _NPC_SPRITE_{sprite_name.upper()}_H_\n")
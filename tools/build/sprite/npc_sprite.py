@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 
+from dataclasses import dataclass
 from math import floor
 from sys import argv, path
 from pathlib import Path
 from typing import List, Dict, Tuple
 import xml.etree.ElementTree as ET
-import png  # type: ignore
 
 path.append(str(Path(__file__).parent.parent))
 path.append(str(Path(__file__).parent.parent.parent))
@@ -13,6 +13,8 @@ path.append(str(Path(__file__).parent.parent.parent / "splat"))
 path.append(str(Path(__file__).parent.parent.parent / "splat_ext"))
 
 from common import get_asset_path, iter_in_groups
+from img.png_cache import read_png
+from img.png_info import read_png_palette
 from splat_ext.pm_sprites import (
     MAX_COMPONENTS_XML,
     PALETTE_GROUPS_XML,
@@ -51,6 +53,33 @@ def resolve_image_path(
     return str(img_path)
 
 
+def palette_name(Palette: ET.Element) -> str:
+    return Palette.get("name", Palette.attrib["src"].split(".png")[0])
+
+
+def raster_name(Raster: ET.Element) -> str:
+    return Raster.attrib["src"].split(".png")[0]
+
+
+@dataclass
+class NpcSpriteNames:
+    image_names: List[str]
+    palette_names: List[str]
+    animation_names: List[str]
+
+
+def names_from_dir(sprite_name: str, asset_stack: Tuple[Path, ...]) -> NpcSpriteNames:
+    """Reads only the names in SpriteSheet.xml, for generating the sprite's header without loading any image"""
+    sprite_sheet_xml_path = get_asset_path(Path(f"sprite/npc/{sprite_name}") / "SpriteSheet.xml", asset_stack)
+    SpriteSheet = ET.parse(sprite_sheet_xml_path).getroot()
+
+    return NpcSpriteNames(
+        [raster_name(Raster) for Raster in SpriteSheet.findall("./RasterList/Raster")],
+        [palette_name(Palette) for Palette in SpriteSheet.findall("./PaletteList/Palette")],
+        [Animation.attrib["name"] for Animation in SpriteSheet.findall("./AnimationList/Animation")],
+    )
+
+
 def from_dir(
     sprite_name: str,
     asset_stack: Tuple[Path, ...],
@@ -84,16 +113,14 @@ def from_dir(
         if asset_stack is not None and load_images:
             img_name = Palette.attrib["src"]
             img_path = resolve_image_path(sprite_dir, "palettes", img_name, asset_stack)
-            img = png.Reader(img_path)
-            img.preamble(True)
-            palette = img.palette(alpha="force")
+            palette = read_png_palette(img_path)
 
             palette = palette[0:16]
             assert len(palette) == 16
 
             palettes.append(palette)
 
-        pal_name = Palette.get("name", Palette.attrib["src"].split(".png")[0])
+        pal_name = palette_name(Palette)
         palette_names.append(pal_name)
         palette_map[pal_name] = idx
 
@@ -105,17 +132,17 @@ def from_dir(
         if asset_stack is not None and load_images:
             img_name = Raster.attrib["src"]
             img_path = resolve_image_path(sprite_dir, "rasters", img_name, asset_stack)
-            width, height, raster, info = png.Reader(img_path).read_flat()
+            decoded = read_png(img_path)
 
             palette_index = int(Raster.attrib["palette"], base=16)
-            image = NpcRaster(width, height, palette_index, raster)
+            image = NpcRaster(decoded.width, decoded.height, palette_index, decoded.raster)
 
             assert (image.width % 8) == 0, f"{img_path} width is not a multiple of 8"
             assert (image.height % 8) == 0, f"{img_path} height is not a multiple of 8"
 
             images.append(image)
 
-        img_name = Raster.attrib["src"].split(".png")[0]
+        img_name = raster_name(Raster)
         image_names.append(img_name)
         image_map[img_name] = idx
 
@@ -10,7 +10,9 @@ sys.path.append(str(Path(__file__).parent.parent))
 sys.path.append(str(Path(__file__).parent.parent.parent))
 sys.path.append(str(Path(__file__).parent.parent.parent))
 sys.path.append(str(Path(__file__).parent.parent.parent / "splat"))
-from common import get_asset_path, iter_in_groups
+from common import get_asset_path
+from img.png_cache import read_png
+from img.png_info import read_png_palette
 from splat_ext.pm_sprites import (
     BACK_PALETTE_XML,
     LIST_END_BYTES,
@@ -25,20 +27,25 @@ from splat_ext.pm_sprites import (
     RasterTableEntry,
 )
 from splat_ext.sprite_common import AnimComponent
+import yay0_cache
 
 import os
-import png  # type: ignore
 import struct
-import subprocess
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
 
 TOOLS_DIR = Path(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 sys.path.append(str(TOOLS_DIR))
 
 ASSET_DIR = TOOLS_DIR.parent / "assets"
 
+# Worker processes for compressing player sprites. The sprite edge runs alongside the rest of the ninja build, so
+# only a few by default, and never more than the 14 player sprites or the machine's CPUs
+PLAYER_SPRITE_JOBS = int(os.environ.get("PM_PLAYER_SPRITE_JOBS", 4))
+MAX_PLAYER_SPRITE_JOBS = 14
+
 
 def pack_color(r, g, b, a) -> int:
     r = r >> 3
@@ -96,6 +103,20 @@ PLAYER_XML_CACHE: Dict[str, ET.Element] = {}
 SPECIAL_RASTER_BYTES = b"\x80\x30\x02\x10\x00\x00\x02\x00\x00\x00\x00\x01\x00\x10\x00\x00"
 
 
+# Shifts a pixel index into the high nibble
+CI4_HIGH_NIBBLE = bytes((i << 4) & 0xFF for i in range(256))
+
+
+def pack_ci4(pixels: bytes) -> bytes:
+    """Packs one-byte-per-pixel indices into CI4, two pixels per byte with the first in the high nibble"""
+    # An odd count would leave low a byte short and shift every nibble after it
+    assert len(pixels) % 2 == 0, "CI4 rasters need an even number of pixels"
+    high = pixels[0::2].translate(CI4_HIGH_NIBBLE)
+    low = pixels[1::2]
+    # The nibbles never overlap, so OR-ing the buffers as big integers combines every byte at once
+    return (int.from_bytes(high, "big") | int.from_bytes(low, "big")).to_bytes(len(high), "big")
+
+
 def cache_player_rasters(raster_order: List[str], asset_stack: Tuple[Path, ...]):
     # Read all player rasters and cache them
     cur_offset = 0
@@ -108,17 +129,11 @@ def cache_player_rasters(raster_order: List[str], asset_stack: Tuple[Path, ...])
             cur_offset += 0x10
             continue
 
-        with open(png_path, "rb") as f:
-            reader = png.Reader(f)
-            width, height, rows, _ = reader.read()
-            img_bytes = b""
-            for row in rows:
-                for a, b in iter_in_groups(row, 2):
-                    byte: int = (a << 4) | b
-                    byte = byte & 0xFF
-                    img_bytes += byte.to_bytes(1, byteorder="big")
-            RASTER_CACHE[raster_name] = CI4Info(cur_offset, width, height, img_bytes)
-            cur_offset += RASTER_CACHE[raster_name].size
+        decoded = read_png(png_path)
+        assert decoded.width % 2 == 0, f"{png_path} width is not a multiple of 2"
+        img_bytes = pack_ci4(decoded.raster)
+        RASTER_CACHE[raster_name] = CI4Info(cur_offset, decoded.width, decoded.height, img_bytes)
+        cur_offset += RASTER_CACHE[raster_name].size
 
 
 def player_raster_from_xml(xml: ET.Element, back: bool = False) -> PlayerRaster:
@@ -232,10 +247,7 @@ def player_xml_to_bytes(sprite_xml: ET.Element, asset_stack: Tuple[Path, ...]) -
         front_only = bool(palette_xml.get("front_only", False))
         if source not in PALETTE_CACHE:
             palette_path = get_asset_path(Path(f"sprite/player/palettes/{source}"), asset_stack)
-            with open(palette_path, "rb") as f:
-                img = png.Reader(f)
-                img.preamble(True)
-                palette = img.palette(alpha="force")
+            palette = read_png_palette(palette_path)
 
             pal: bytes = b""
             for rgba in palette:
@@ -450,73 +462,54 @@ def write_player_sprite_header(
         f.write(f"#endif // {ifdef_name}\n")
 
 
-def build_player_sprites(sprite_order: List[str], build_dir: Path, asset_stack: Tuple[Path, ...]) -> bytes:
-    sprite_bytes: List[bytes] = []
+def pack_yay0_list(compressed: List[bytes], padding: Callable[[int], int]) -> bytes:
+    """Lays out an offset list followed by each Yay0 blob, padded by padding(size) zeros"""
+    offsets: List[int] = []
+    blob = bytearray()
+    yay0_cur_offset = 4 * (len(compressed) + 1)
+    offsets.append(yay0_cur_offset)
 
-    for sprite_name in sprite_order:
-        sprite_bytes.extend(player_xml_to_bytes(PLAYER_XML_CACHE[sprite_name], asset_stack))
+    for yay0_bytes in compressed:
+        pad = padding(len(yay0_bytes))
+        blob += yay0_bytes
+        blob += bytes(pad)
 
-    # Compress sprite bytes
-    compressed_sprite_bytes: bytes = b""
-    yay0_cur_offset = 4 * (len(sprite_bytes) + 1)
-    list_bytes: bytes = struct.pack(">I", yay0_cur_offset)
-
-    # TODO figure out how to use tmp files if possible
-    build_dir.mkdir(exist_ok=True, parents=True)
-    yay0_in_path = build_dir / "yay0_bytes.bin"
-    yay0_out_path = build_dir / "yay0_bytes.Yay0"
-
-    for sprite_byte in sprite_bytes:
-        with open(yay0_in_path, "wb") as f:
-            f.write(sprite_byte)
-
-        subprocess.run(
-            [
-                str("crunch64"),
-                "compress",
-                "yay0",
-                yay0_in_path,
-                yay0_out_path,
-            ]
-        )
+        yay0_cur_offset += len(yay0_bytes) + pad
+        offsets.append(yay0_cur_offset)
 
-        with open(yay0_out_path, "rb") as f:
-            yay0_bytes = f.read()
-            # Pad to 0x8
-            yay0_bytes += b"\0" * (8 - (len(yay0_bytes) % 8))
+    return struct.pack(f">{len(offsets)}I", *offsets) + blob
 
-        compressed_sprite_bytes += yay0_bytes
-        yay0_cur_offset += len(yay0_bytes)
-        list_bytes += struct.pack(">I", yay0_cur_offset)
 
-    os.remove(yay0_in_path)
-    os.remove(yay0_out_path)
+def build_player_sprites(sprite_order: List[str], asset_stack: Tuple[Path, ...]) -> bytes:
+    sprite_bytes: List[bytes] = []
 
-    return list_bytes + compressed_sprite_bytes
+    for sprite_name in sprite_order:
+        sprite_bytes.extend(player_xml_to_bytes(PLAYER_XML_CACHE[sprite_name], asset_stack))
+
+    # Compress sprite bytes, in parallel since every sprite is independent
+    num_workers = min(PLAYER_SPRITE_JOBS, MAX_PLAYER_SPRITE_JOBS, os.cpu_count() or 1, len(sprite_bytes))
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            compressed = list(pool.map(yay0_cache.compress, sprite_bytes))
+    else:
+        compressed = [yay0_cache.compress(sprite_byte) for sprite_byte in sprite_bytes]
+
+    # Pad to 0x8 (a full 8 bytes when already aligned)
+    return pack_yay0_list(compressed, lambda size: 8 - (size % 8))
 
 
 def build_npc_sprites(sprite_order: List[str], build_dir: Path) -> bytes:
-    compressed_sprite_bytes: bytes = b""
-    yay0_cur_offset = 4 * (len(sprite_order) + 1)
-    list_bytes: bytes = struct.pack(">I", yay0_cur_offset)
+    compressed: List[bytes] = []
 
     for sprite_name in sprite_order:
         with open(build_dir / "npc" / f"{sprite_name}.Yay0", "rb") as f:
-            yay0_bytes = f.read()
-
-            # Add 0s to pad to 0x8
-            yay0_bytes_len = (len(yay0_bytes) + 0x7) & ~0x7
-            yay0_bytes += b"\0" * (yay0_bytes_len - len(yay0_bytes))
+            compressed.append(f.read())
 
-        compressed_sprite_bytes += yay0_bytes
-        yay0_cur_offset += len(yay0_bytes)
-        list_bytes += struct.pack(">I", yay0_cur_offset)
-
-    return list_bytes + compressed_sprite_bytes
+    # Add 0s to pad to 0x8
+    return pack_yay0_list(compressed, lambda size: -size & 0x7)
 
 
 def build_player_rasters(sprite_order: List[str], raster_order: List[str]) -> bytes:
-    packed_raster_data = b""
     raster_info_offsets: list[int] = []
     rtes: List[RasterTableEntry] = []
     num_sheets = 0
@@ -554,9 +547,7 @@ def build_player_rasters(sprite_order: List[str], raster_order: List[str]) -> by
             rtes.extend(sheet_rtes_back)
     raster_info_offsets.append(len(rtes))  # Final 'offset' (size of list)
 
-    info_list_bytes = b""
-    for offset in raster_info_offsets:
-        info_list_bytes += struct.pack(">I", offset)
+    info_list_bytes = struct.pack(f">{len(raster_info_offsets)}I", *raster_info_offsets)
 
     separators_offset = 0x10
     infos_offset = separators_offset + (num_sheets + 1) * 4
@@ -565,17 +556,19 @@ def build_player_rasters(sprite_order: List[str], raster_order: List[str]) -> by
     # Align raster_offset_start to 0x10 offset
     rasters_offset = (rasters_offset + 0xF) & ~0xF
 
+    packed_infos: List[int] = []
     for rte in rtes:
         if rte.offset == SPECIAL_RASTER:
-            packed_raster_data += struct.pack(">I", 0x0011F880)
+            packed_infos.append(0x0011F880)
             continue
 
         packed_info = (rte.size >> 4) << 20
         packed_info |= (rte.offset + rasters_offset) & 0xFFFFF
-        packed_raster_data += struct.pack(">I", packed_info)
+        packed_infos.append(packed_info)
 
     # This is the missing raster from before
-    packed_raster_data += struct.pack(">I", 0x06C9CD50)
+    packed_infos.append(0x06C9CD50)
+    packed_raster_data = struct.pack(f">{len(packed_infos)}I", *packed_infos)
 
     header = struct.pack(">IIII", separators_offset, infos_offset, rasters_offset, 0)
 
@@ -584,13 +577,10 @@ def build_player_rasters(sprite_order: List[str], raster_order: List[str]) -> by
     # Align cumulative data to 0x10 offset
     ret += b"\0" * ((0x10 - len(ret)) & 0xF)
 
-    raster_bytes = b""
-    for raster_name in raster_order[:-1]:  # Skip last raster
-        png_info = RASTER_CACHE[raster_name]
-        raster_bytes += png_info.data
+    # Skip last raster
+    raster_bytes = b"".join(RASTER_CACHE[raster_name].data for raster_name in raster_order[:-1])
 
-    ret += raster_bytes
-    return ret
+    return ret + raster_bytes
 
 
 def build(
@@ -613,7 +603,7 @@ def build(
     build_info_bytes = build_info.encode("ascii")
     build_info_bytes += b"\0" * (0x10 - len(build_info_bytes))
 
-    player_sprite_bytes = build_player_sprites(player_sprite_order, build_dir / "player", asset_stack)
+    player_sprite_bytes = build_player_sprites(player_sprite_order, asset_stack)
     player_raster_bytes = build_player_rasters(player_sprite_order, player_raster_order)
     npc_sprite_bytes = build_npc_sprites(npc_sprite_order, build_dir)
 
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+"""
+Yay0 compression with a persistent, content-addressed cache shared by every version and build directory.
+
+Compressed blobs are stored under CACHE_DIR by the hash of their input, so clean builds and branch switches only
+recompress data that actually changed. See file_cache.py for how entries are stored and evicted.
+
+usage: yay0_cache.py [in.bin] [out.Yay0]
+
+Environment:
+    PM_YAY0_CACHE_DIR     cache location (default: .cache/yay0 in the repo root)
+    PM_YAY0_CACHE_SIZE    size limit in MiB (default: 512), 0 disables the cache
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from sys import argv
+
+import crunch64
+
+from file_cache import FileCache
+
+ROOT_DIR = Path(__file__).parent.parent.parent
+
+CACHE_DIR = Path(os.environ.get("PM_YAY0_CACHE_DIR", ROOT_DIR / ".cache" / "yay0"))
+CACHE_SIZE = int(os.environ.get("PM_YAY0_CACHE_SIZE", 512)) * 1024 * 1024
+
+CACHE = FileCache(CACHE_DIR, ".Yay0", CACHE_SIZE)
+
+
+def cache_key(data: bytes) -> str:
+    # Different crunch64 releases may compress differently, so they don't share entries
+    h = hashlib.blake2b(digest_size=20)
+    h.update(crunch64.__version__.encode())
+    h.update(data)
+    return h.hexdigest()
+
+
+def compress(data: bytes) -> bytes:
+    if not CACHE.enabled:
+        return crunch64.yay0.compress(data)
+
+    key = cache_key(data)
+    compressed = CACHE.load(key)
+    if compressed is None:
+        compressed = crunch64.yay0.compress(data)
+        CACHE.store(key, compressed)
+    return compressed
+
+
+if __name__ == "__main__":
+    if len(argv) != 3:
+        print("usage: yay0_cache.py [in.bin] [out.Yay0]")
+        exit(1)
+
+    _, infile, outfile = argv
+
+    with open(infile, "rb") as f:
+        compressed = compress(f.read())
+
+    with open(outfile, "wb") as f:
+        f.write(compressed)
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
 from functools import lru_cache
+import json
 import os
 import shutil
-from typing import List, Dict, Set, Union
+from typing import List, Dict, Set, Tuple, Union
 from pathlib import Path
 import subprocess
 import sys
@@ -22,6 +23,10 @@ CRC_TOOL = f"{BUILD_TOOLS}/rom/n64crc"
 PIGMENT64 = "pigment64"
 CRUNCH64 = "crunch64"
 
+# Most images converted per img_batch edge. Batches never span asset directories, so a changed image only
+# reruns the conversions of its own directory, at most this many
+IMG_BATCH_SIZE = 64
+
 RUST_TOOLS = [
     (PIGMENT64, "pigment64", "0.4.2"),
     (CRUNCH64, "crunch64-cli", "0.3.1"),
@@ -197,28 +202,26 @@ def write_ninja_rules(
         command=f"{cpp} {CPPFLAGS} {extra_cppflags} $cppflags $in -o  - | {cross}as -EB -march=vr4300 -mtune=vr4300 -Iinclude -o $out",
     )
 
-    ninja.rule(
-        "img",
-        description="img($img_type) $in",
-        command=f"$python {BUILD_TOOLS}/img/build.py $img_type $in $out $img_flags",
-    )
-
     ninja.rule(
         "pigment",
         description="img($img_type) $in",
         command=f"{PIGMENT64} to-bin $img_flags -f $img_type -o $out $in",
     )
 
+    # Many image conversions and headers in one process; see Configure.write_ninja's build_img
     ninja.rule(
-        "img_header",
-        description="img_header $in",
-        command=f'$python {BUILD_TOOLS}/img/header.py $in $out "$c_name"',
+        "img_batch",
+        description="img_batch $img_manifest",
+        command=f"$python {BUILD_TOOLS}/img/build.py --batch $img_manifest",
+        rspfile="$img_manifest",
+        rspfile_content="$img_jobs",
+        restat=True,
     )
 
     ninja.rule(
         "yay0",
         description="yay0 $in",
-        command=f"crunch64 compress yay0 $in $out",
+        command=f"$python {BUILD_TOOLS}/yay0_cache.py $in $out",
     )
 
     ninja.rule(
@@ -239,10 +242,12 @@ def write_ninja_rules(
         command=f"$python {BUILD_TOOLS}/sprite/header.py $out $sprite_name $sprite_id $asset_stack",
     )
 
+    # All sections of a message segment are compiled by one process; unchanged outputs are not rewritten
     ninja.rule(
         "msg",
         description="msg $in",
-        command=f"$python {BUILD_TOOLS}/msg/parse_compile.py $version $in $out",
+        command=f"$python {BUILD_TOOLS}/msg/parse_compile.py $version --batch $in --out $out",
+        restat=True,
     )
 
     ninja.rule(
@@ -279,12 +284,14 @@ def write_ninja_rules(
         "msg_combine",
         description="msg_combine $out",
         command=f"$python {BUILD_TOOLS}/msg/combine.py $out $in",
+        restat=True,
     )
 
     ninja.rule(
         "msg_combine_noheader",
         description="msg_combine $out",
         command=f"$python {BUILD_TOOLS}/msg/combine.py --no-header $out $in",
+        restat=True,
     )
 
     ninja.rule(
@@ -569,6 +576,51 @@ class Configure:
                     implicit_outputs=implicit_outputs,
                 )
 
+        img_jobs: List[Tuple[Path, Path, str, List[str]]] = []
+
+        def build_img(out_path: Path, src_path: Path, mode: str, flags: List[str] = []):
+            # Queued rather than built right away: Python's startup cost outweighs converting a single image,
+            # so flush_img_jobs runs them per asset directory, IMG_BATCH_SIZE at a time, through img/build.py --batch.
+            # mode is an img/build.py mode, or "header" for img/header.py's output with flags = [c_name].
+            img_jobs.append((out_path, src_path, mode, flags))
+
+        def flush_img_jobs():
+            jobs = []
+            queued: Set[str] = set()
+            for job in img_jobs:
+                out_str = str(job[0])
+                if out_str not in skip_outputs and out_str not in queued:
+                    queued.add(out_str)
+                    jobs.append(job)
+            img_jobs.clear()
+
+            jobs_by_dir: Dict[Path, List[Tuple[Path, Path, str, List[str]]]] = {}
+            for job in jobs:
+                jobs_by_dir.setdefault(job[1].parent, []).append(job)
+
+            batches = []
+            for dir_jobs in jobs_by_dir.values():
+                for start in range(0, len(dir_jobs), IMG_BATCH_SIZE):
+                    batches.append(dir_jobs[start : start + IMG_BATCH_SIZE])
+
+            for batch_idx, batch in enumerate(batches):
+                manifest = []
+                for out_path, src_path, mode, flags in batch:
+                    resolved = self.resolve_src_paths([src_path])
+                    in_path = resolved[0] if resolved else str(src_path)
+                    manifest.append([mode, in_path, str(out_path), *flags])
+
+                build(
+                    [out_path for out_path, _, _, _ in batch],
+                    [src_path for _, src_path, _, _ in batch],
+                    "img_batch",
+                    variables={
+                        "img_manifest": str(self.build_path() / f"img_batch_{batch_idx}.rsp"),
+                        # Ninja values can't hold newlines, so the manifest is a single JSON array
+                        "img_jobs": ninja_syntax.escape(json.dumps(manifest, separators=(",", ":"))),
+                    },
+                )
+
         # Effect data includes
         effect_yaml = ROOT / "src/effects.yaml"
         effect_data_outdir = ROOT / "assets" / self.version / "effects"
@@ -822,13 +874,7 @@ class Configure:
                             name = c_sym.name
                             if "namespaced" in seg.args:
                                 name = f"N({name[7:]})"
-                            vars = {"c_name": name}
-                            build(
-                                inc_dir / (seg.name + ".png.h"),
-                                src_paths,
-                                "img_header",
-                                vars,
-                            )
+                            build_img(inc_dir / (seg.name + ".png.h"), src_paths[0], "header", [name])
                         elif isinstance(seg, splat.segtypes.n64.palette.N64SegPalette):
                             src_paths = [seg.out_path().relative_to(ROOT)]
                             inc_dir = self.build_path() / "include" / seg.dir
@@ -920,7 +966,7 @@ class Configure:
                 #     addr=seg.vram_start, in_segment=True, type="data", define=True
                 # )
                 # vars = {"c_name": c_sym.name}
-                build(inc_dir / (seg.name + ".png.h"), entry.src_paths, "img_header")
+                build_img(inc_dir / (seg.name + ".png.h"), entry.src_paths[0], "header")
             elif isinstance(seg, splat.segtypes.n64.palette.N64SegPalette):
                 bin_path = entry.object_path.with_suffix(".bin")
 
@@ -961,10 +1007,10 @@ class Configure:
                     )
                     build(yay0_path, [bin_path], "yay0")
 
-                    # NPC sprite header
+                    # NPC sprite header: only names from SpriteSheet.xml, so pixel edits don't touch it
                     build(
                         self.build_path() / "include/sprite/npc" / (sprite_name + ".h"),
-                        [sprite_dir, yay0_path],
+                        [sprite_dir / "SpriteSheet.xml"],
                         "sprite_header",
                         variables={
                             "sprite_name": sprite_name,
@@ -993,12 +1039,11 @@ class Configure:
                 build(entry.object_path, [entry.object_path.with_suffix(".bin")], "bin")
 
             elif seg.type == "pm_msg":
-                msg_bins = []
-
-                for section_idx, msg_path in enumerate(entry.src_paths):
-                    bin_path = entry.object_path.with_suffix("") / f"{section_idx:02X}.bin"
-                    msg_bins.append(bin_path)
-                    build(bin_path, [msg_path], "msg")
+                msg_bins = [
+                    entry.object_path.with_suffix("") / f"{section_idx:02X}.bin"
+                    for section_idx in range(len(entry.src_paths))
+                ]
+                build(msg_bins, entry.src_paths, "msg")
 
                 if seg.generate_header:
                     build(
@@ -1046,15 +1091,7 @@ class Configure:
 
                     if name.startswith("party_"):
                         compress = True
-                        build(
-                            bin_path,
-                            [path],
-                            "img",
-                            variables={
-                                "img_type": "party",
-                                "img_flags": "",
-                            },
-                        )
+                        build_img(bin_path, path, "party")
                     elif path.suffixes[-2:] == [".raw", ".dat"]:
                         compress = False
                         bin_path = path
@@ -1125,15 +1162,7 @@ class Configure:
                         build(bin_path, imgs, "pack_title_data")
                     elif name.endswith("_bg"):
                         compress = True
-                        build(
-                            bin_path,
-                            [path],
-                            "img",
-                            variables={
-                                "img_type": "bg",
-                                "img_flags": "",
-                            },
-                        )
+                        build_img(bin_path, path, "bg")
                     elif name.endswith("_tex"):
                         compress = False
                         tex_dir = path.parent / name
@@ -1235,6 +1264,8 @@ class Configure:
             else:
                 raise Exception(f"don't know how to build {seg.__class__.__name__} '{seg.name}'")
 
+        flush_img_jobs()
+
         # Phony target for building all objects but not linking
         ninja.build(
             "lib_" + self.version,
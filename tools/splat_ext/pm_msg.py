@@ -1,8 +1,9 @@
 import shutil
+import multiprocessing
+import os
 from splat.segtypes.segment import Segment
 from pathlib import Path
 from splat.util import options
-import re
 
 import pylibyaml
 import yaml as yaml_loader
@@ -3273,6 +3274,23 @@ CHARSET_IQUE = {
 }
 
 
+# Marks a byte that has neither its own entry nor a None default in a charset
+_UNMAPPED = object()
+
+# id(charset) -> (256-entry dispatch table, None default)
+_compiled_charsets = {}
+
+
+def compile_charset(charset):
+    """Flattens a charset dict into a list indexed by byte, filling unlisted bytes with the charset's None default"""
+    compiled = _compiled_charsets.get(id(charset))
+    if compiled is None:
+        default = charset.get(None, _UNMAPPED)
+        compiled = ([charset.get(byte, default) for byte in range(256)], default)
+        _compiled_charsets[id(charset)] = compiled
+    return compiled
+
+
 class N64SegPm_msg(Segment):
     def __init__(
         self,
@@ -3301,6 +3319,36 @@ class N64SegPm_msg(Segment):
         with (Path(__file__).parent / toc_file).open("r") as f:
             self.msg_names = yaml_loader.load(f.read(), Loader=yaml_loader.SafeLoader)
 
+        # (section, index) -> name; the first entry wins if the toc lists an id twice
+        self.msg_name_index = {}
+        for d in self.msg_names:
+            section, index, goodname = d[:3]
+            self.msg_name_index.setdefault((section, index), goodname)
+
+        target_path = str(options.opts.target_path)
+        if "ver/jp" in target_path:
+            self.default_root_charset = CHARSET_KANA
+        elif "ver/ique" in target_path:
+            self.default_root_charset = CHARSET_IQUE
+        else:
+            self.default_root_charset = CHARSET_STANDARD
+
+        # lowercased markup -> charset it switches the message's root charset to
+        self.markup_root_charsets = {
+            "[font title]\n": CHARSET_CREDITS,
+            "[font subtitle]\n": CHARSET_CREDITS,
+            "[font standard]": CHARSET_STANDARD,
+        }
+        if "ver/jp" in target_path:
+            self.markup_root_charsets.update(
+                {
+                    "[charset kana]": CHARSET_KANA,
+                    "[charset latin]": CHARSET_LATIN,
+                    "[charset kanji]": CHARSET_KANJI,
+                    "[charset buttons]": CHARSET_BUTTONS,
+                }
+            )
+
     def split(self, rom_bytes):
         data = bytearray(rom_bytes[self.rom_start : self.rom_end])
 
@@ -3318,6 +3366,7 @@ class N64SegPm_msg(Segment):
         msg_dir = options.opts.asset_path / self.name
         msg_dir.mkdir(parents=True, exist_ok=True)
 
+        sections = []
         for i, section_offset in enumerate(section_offsets):
             name = f"{i:02X}"
             if len(self.files) >= i:
@@ -3336,27 +3385,48 @@ class N64SegPm_msg(Segment):
 
             # self.log(f"Reading {len(msg_offsets)} messages in section {name} (0x{i:02X})")
 
-            path = msg_dir / Path(name + ".msg")
+            sections.append((msg_dir / Path(name + ".msg"), i, msg_offsets))
 
-            with open(path, "w") as self.f:
-                for j, msg_offset in enumerate(msg_offsets):
-                    if j != 0:
-                        self.f.write("\n")
+        # Sections are independent, so dump them in parallel. Workers must be forked rather than pooled: splat loads
+        # this module from a path, so nothing in it can be pickled, but a forked child inherits the segment and
+        # options. Forking is only done where it's already the platform's default start method; elsewhere (macOS,
+        # Windows, Python 3.14+ on Linux) the sections are dumped serially.
+        context = multiprocessing.get_context()
+        num_workers = min(os.cpu_count() or 1, len(sections))
+        if num_workers > 1 and context.get_start_method() == "fork":
+            workers = [
+                context.Process(target=self.write_sections, args=(data, sections[i::num_workers]))
+                for i in range(num_workers)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
 
-                    msg_name = None
-                    for d in self.msg_names:
-                        section, index, goodname = d[:3]
+            if any(worker.exitcode != 0 for worker in workers):
+                raise RuntimeError(f"failed to split {self.name}")
+        else:
+            self.write_sections(data, sections)
 
-                        if i == section and j == index:
-                            msg_name = goodname
-                            break
+    def write_sections(self, data, sections):
+        data = memoryview(data)
+        for path, section, msg_offsets in sections:
+            self.write_section(path, data, section, msg_offsets)
 
-                    if msg_name is None:
-                        self.f.write(f"#message:{i:02X}:{j:03X} {{\n\t")
-                    else:
-                        self.f.write(f"#message:{i:02X}:({msg_name}) {{\n\t")
-                    self.write_message_markup(data[msg_offset:])
-                    self.f.write("\n}\n")
+    def write_section(self, path, data, section, msg_offsets):
+        with open(path, "w") as self.f:
+            for j, msg_offset in enumerate(msg_offsets):
+                if j != 0:
+                    self.f.write("\n")
+
+                msg_name = self.msg_name_index.get((section, j))
+
+                if msg_name is None:
+                    self.f.write(f"#message:{section:02X}:{j:03X} {{\n\t")
+                else:
+                    self.f.write(f"#message:{section:02X}:({msg_name}) {{\n\t")
+                self.write_message_markup(data, msg_offset)
+                self.f.write("\n}\n")
 
     def get_linker_entries(self):
         from splat.segtypes.linker_entry import LinkerEntry
@@ -3370,25 +3440,21 @@ class N64SegPm_msg(Segment):
     def get_default_name(addr):
         return "msg"
 
-    def write_message_markup(self, data):
-        pos = 0
-        if "ver/jp" in str(options.opts.target_path):
-            self.root_charset = CHARSET_KANA
-        elif "ver/ique" in str(options.opts.target_path):
-            self.root_charset = CHARSET_IQUE
-        else:
-            self.root_charset = CHARSET_STANDARD
+    def write_message_markup(self, data, pos=0):
+        """Decodes the message starting at data[pos], which must be a memoryview so arguments aren't copied"""
+        self.root_charset = self.default_root_charset
+        value = None
+        fallback = None
 
         while data[pos] != 0xFD:
-            self.charset = self.root_charset
+            table, default = compile_charset(self.root_charset)
 
             while True:
-                char = data[pos]
+                entry = table[data[pos]]
 
-                if char in self.charset:
-                    value = self.charset[char]
-                elif None in self.charset:
-                    value = self.charset[None]
+                # A byte with no entry and no default reuses the previous value
+                if entry is not _UNMAPPED:
+                    value = entry
 
                 if value is None:
                     value = fallback
@@ -3403,9 +3469,9 @@ class N64SegPm_msg(Segment):
                     pos += delta
                     break
                 elif isinstance(value, dict):
-                    if None in self.charset:
-                        fallback = self.charset[None]
-                    self.charset = value
+                    if default is not _UNMAPPED:
+                        fallback = default
+                    table, default = compile_charset(value)
                     pos += 1
                 else:
                     raise ValueError(value)
@@ -3413,23 +3479,11 @@ class N64SegPm_msg(Segment):
         self.write_markup("[End]")
 
     def write_markup(self, markup):
-        self.f.write(re.sub("\n", "\n\t", markup))
-
-        markup_lower = markup.lower()
+        self.f.write(markup.replace("\n", "\n\t"))
 
-        if markup_lower == "[font title]\n" or markup_lower == "[font subtitle]\n":
-            self.root_charset = CHARSET_CREDITS
-        elif markup_lower == "[font standard]":
-            self.root_charset = CHARSET_STANDARD
-        elif "ver/jp" in str(options.opts.target_path):
-            if markup_lower == "[charset kana]":
-                self.root_charset = CHARSET_KANA
-            elif markup_lower == "[charset latin]":
-                self.root_charset = CHARSET_LATIN
-            elif markup_lower == "[charset kanji]":
-                self.root_charset = CHARSET_KANJI
-            elif markup_lower == "[charset buttons]":
-                self.root_charset = CHARSET_BUTTONS
+        root_charset = self.markup_root_charsets.get(markup.lower())
+        if root_charset is not None:
+            self.root_charset = root_charset
 
     def cache(self):
         return (self.yaml, self.rom_end, self.msg_names)
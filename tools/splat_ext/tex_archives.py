@@ -4,7 +4,6 @@ import struct
 import json
 from pathlib import Path
 
-import png
 import n64img.image
 from common import iter_in_groups
 
@@ -12,6 +11,7 @@ from sys import path
 
 path.append(str(Path(__file__).parent.parent / "build"))
 from img.build import Converter
+from img.png_info import read_png_palette
 
 
 def decode_null_terminated_ascii(data):
@@ -408,9 +408,7 @@ class TexImage:
 
         out_pal = bytearray()
         if fmt_str == "CI4" or fmt_str == "CI8":
-            img = png.Reader(img_file)
-            img.preamble(True)
-            palette = img.palette(alpha="force")
+            palette = read_png_palette(img_file)
 
             # load_texture_by_name assumes palettes have a particular length
             palette_count = (0x20 if fmt_str == "CI4" else 0x200) // 2